@@ -1,13 +1,16 @@
 import pandas as pd
 import os
-import re
-import warnings
-from datetime import datetime, timedelta
-from openpyxl import load_workbook
-import xlrd
-
-# Supprimer les avertissements de openpyxl si il lit des fichiers mal nommés
-warnings.filterwarnings('ignore', category=UserWarning, module='openpyxl')
+import pickle
+import threading
+from pointage_records import (
+    clean_name_string, drop_conge_rows, filter_ouvriers, inputs_exist, is_path,
+    load_file_records, load_records, report_target, scan_columns, scan_matrix, source_name
+)
+from stage_profiler import profiled
+from excel_export import excel_writer, use_constant_memory, write_columns
+from pointage_rules import (
+    first_and_last_scan, half_day_flags, lateness_flags, worked_hours
+)
 
 # --- CONFIGURATION ---
 CHEMIN_DOSSIER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Data")
@@ -19,305 +22,166 @@ EMPLOYES_EXCLUS = [
     "HMOURI ALI"
 ]
 
-# CODES QUI SIGNIFIENT UN "OUVRIER"
-CODES_OUVRIER = ['130', '140', '141', '131']
-
-# --- CLASSE UTILITAIRE POUR COMPATIBILITÉ XLS ---
-class MockCell:
-    """Imite un objet cellule openpyxl pour les fichiers .xls lus via xlrd."""
-    def __init__(self, value):
-        self.value = value
-
-def clean_name_string(name):
-    """Normalise les noms pour assurer la correspondance malgré les espaces/caractères cachés."""
-    if not name:
-        return ""
-    name = str(name).upper()
-    name = name.replace('\xa0', ' ').replace('\t', ' ').replace('\n', ' ')
-    name = re.sub(r'\s+', ' ', name)
-    return name.strip()
-
-def parse_scan_times(scan_str):
-    """Analyse la chaîne pour trouver toutes les entrées de temps (HH:MM)."""
-    if scan_str is None:
-        return {}, 0, []
-    scan_str = str(scan_str)
-    times = re.findall(r'\d{1,2}:\d{2}', scan_str)
-    count = len(times)
-    scans = {}
-    for i, time_val in enumerate(times):
-        scans[f'scan_{i+1}'] = time_val  
-    return scans, count, times
-
-def get_sheet_rows(file_path):
-    """Générateur qui produit des lignes de fichiers .xlsx ou .xls."""
-    ext = os.path.splitext(file_path)[1].lower()
-    
-    def read_with_openpyxl(path):
-        wb = load_workbook(path, data_only=True)
-        sheet = wb.active
-        for row in sheet.iter_rows():
-            yield row
-
-    if ext in ['.xlsx', '.xlsm']:
-        yield from read_with_openpyxl(file_path)
-    elif ext == '.xls':
-        try:
-            workbook = xlrd.open_workbook(file_path)
-            sheet = workbook.sheet_by_index(0)
-            for row_idx in range(sheet.nrows):
-                row_data = []
-                for col_idx in range(sheet.ncols):
-                    val = sheet.cell_value(row_idx, col_idx)
-                    row_data.append(MockCell(val))
-                yield row_data
-        except Exception as e:
-            error_msg = str(e).lower()
-            if "xlsx" in error_msg or "zip" in error_msg:
-                print(f"Attention : '{os.path.basename(file_path)}' est un fichier .xlsx nommé comme .xls. Changement de moteur...")
-                try:
-                    yield from read_with_openpyxl(file_path)
-                except Exception as e2:
-                    print(f"Échec de lecture du fichier avec secours : {e2}")
-            else:
-                print(f"Erreur lors du traitement du fichier .xls {os.path.basename(file_path)} : {e}")
-                return
+# MODE INCRÉMENTAL : état des statistiques par jour, réutilisé d'une exécution à l'autre.
+# Désactivé par défaut : chaque jour est encore haché et chaque état partiel additionné à chaque exécution,
+# le calcul complet est aussi rapide (et plus rapide qu'une première exécution incrémentale).
+MODE_INCREMENTAL = False
+ETAT_INCREMENTAL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".daily_state")
+
+# Indicateurs additionnés par employé sur la période
+STATS_COLUMNS = ['is_late_930', 'is_late_1000', 'is_late_1400', 'no_lunch', 'is_half_day']
+
+# Colonnes retenues pour l'analyse quotidienne
+DAILY_COLUMNS = [
+    'source_file', 'name', 'day_numeric', 'day_str', 'hj_code',
+    'scan_count', 'month_num', 'year_num'
+]
 
-def process_employee_buffer(employee_data):
+def select_daily_records(records):
     """
-    Décide si un employé est un OUVRIER basé sur les codes HJ.
-    Retourne les enregistrements si ADM, retourne une liste vide si OUVRIER.
+    Sélectionne dans la table partagée les lignes utiles à l'analyse quotidienne :
+    exclut les congés ("CONGE-"), les lignes d'en-tête et les employés OUVRIER.
     """
-    if not employee_data or not employee_data.get('records'):
-        return []
+    if records.empty:
+        return pd.DataFrame(columns=DAILY_COLUMNS)
 
-    records = employee_data['records']
-    name = employee_data.get('name', 'Unknown')
-    
-    # 1. Filtrer uniquement pour les jours de semaine (exclure Sam/Dim) pour la logique de classification
-    weekday_recs = []
-    for r in records:
-        day_str = str(r.get('day_str', '')).lower()
-        if not day_str.startswith('sa') and not day_str.startswith('di'):
-            weekday_recs.append(r)
-    
-    if not weekday_recs:
-        return records
-
-    # 2. Compter combien d'enregistrements de jours de semaine correspondent aux CODES_OUVRIER
-    ouvrier_matches = 0
-    for r in weekday_recs:
-        raw_hj = str(r['hj_code'])
-        if '.' in raw_hj:
-            hj = raw_hj.split('.')[0].strip()
-        else:
-            hj = raw_hj.strip()
-            
-        if hj in CODES_OUVRIER:
-            ouvrier_matches += 1
-    
-    # 3. Calculer le Ratio
-    ratio = ouvrier_matches / len(weekday_recs)
-    
-    # 4. Si strictement plus de 50% correspondent aux codes Ouvrier, les exclure
-    if ratio > 0.5:
-        return []
-    
-    return records
-
-def extract_month_year_from_filename(file_path):
-    """Extrait le mois et l'année du nom de fichier."""
-    filename = os.path.basename(file_path).upper()
-    
-    # Chercher les mois en français dans le nom de fichier
-    months = {
-        'JANVIER': '01', 'FEVRIER': '02', 'MARS': '03', 'AVRIL': '04',
-        'MAI': '05', 'JUIN': '06', 'JUILLET': '07', 'AOUT': '08',
-        'SEPTEMBRE': '09', 'OCTOBRE': '10', 'NOVEMBRE': '11', 'DECEMBRE': '12'
-    }
-    
-    # Chercher l'année (4 chiffres)
-    year_match = re.search(r'\b(20\d{2})\b', filename)
-    year = year_match.group(1) if year_match else '2025'
-    
-    # Chercher le mois
-    for month_name, month_num in months.items():
-        if month_name in filename:
-            return month_num, year
-    
-    # Si aucun mois trouvé, essayer de chercher des nombres de 1-12
-    month_match = re.search(r'\b(0[1-9]|1[0-2])\b', filename)
-    if month_match:
-        return month_match.group(1), year
-    
-    # Valeur par défaut
-    return '12', year
+    daily = filter_ouvriers(drop_conge_rows(records))
+    return daily[DAILY_COLUMNS + scan_columns(daily)].reset_index(drop=True)
 
 def extract_daily_data(file_path):
-    """Extrait les données, met en mémoire tampon par employé pour vérifier le statut "Ouvrier" via la colonne HJ."""
-    all_records = []
-    current_employee = {'service': '', 'name': '', 'matricule': '', 'records': []}
-    source_file_name = os.path.basename(file_path)
-    month_num, year_num = extract_month_year_from_filename(file_path)
-    days_french = ['Lu', 'Ma', 'Me', 'Je', 'Ve', 'Sa', 'Di']
-    
-    try:
-        for row in get_sheet_rows(file_path):
-            if not row: continue
-            
-            cell_0 = row[0]
-            val_0 = str(cell_0.value).strip() if cell_0.value else ''
-            
-            # --- VÉRIFIER NOUVELLE SECTION OU NOM (DÉCLENCHE TRAITEMENT TAMpon) ---
-            if 'SERVICE / SECTION :' in val_0 or 'NOM :' in val_0:
-                valid_records = process_employee_buffer(current_employee)
-                all_records.extend(valid_records)
-
-            if 'SERVICE / SECTION :' in val_0:
-                current_employee = {
-                    'service': val_0.replace('SERVICE / SECTION :', '').strip(),
-                    'name': '', 'matricule': '', 'records': []
-                }
-            
-            elif 'NOM :' in val_0:
-                raw_name = val_0.replace('NOM :', '').strip()
-                current_employee = {
-                    'service': current_employee.get('service', ''),
-                    'name': clean_name_string(raw_name),
-                    'matricule': '', 
-                    'records': []
-                }
-
-            elif 'MATRICULE :' in val_0:
-                current_employee['matricule'] = val_0.replace('MATRICULE :', '').strip()
-                
-            # --- ANALYSER LES DONNÉES QUOTIDIENNES ---
-            elif any(val_0.startswith(day) for day in days_french) and any(char.isdigit() for char in val_0):
-                
-                hj_val = row[1].value if len(row) > 1 else ''
-                raw_scan_val = row[2].value if len(row) > 2 else ''
-                
-                # VÉRIFIER CONGÉ/ABSENCE
-                row_text = (val_0 + " " + str(raw_scan_val)).upper()
-                if "CONGE-" in row_text:
-                    continue
-
-                if 'Date' not in val_0 and 'Heures' not in val_0:
-                    scan_times_dict, calculated_count, times_list = parse_scan_times(raw_scan_val)
-                    parts = val_0.split()
-                    
-                    day_match = re.search(r'\d+', val_0)
-                    day_num = int(day_match.group()) if day_match else 0
-                    day_str = parts[0] if parts else ''
-
-                    record = {
-                        'source_file': source_file_name,
-                        'name': current_employee.get('name', ''),
-                        'day_raw': parts[0] if parts else '',
-                        'day_numeric': day_num,
-                        'day_str': day_str,
-                        'hj_code': str(hj_val).strip(),
-                        'scan_count': calculated_count,
-                        'raw_pointages': str(raw_scan_val) if raw_scan_val else '',
-                        'month_num': month_num,
-                        'year_num': year_num
-                    }
-                    current_employee['records'].append(record)
-        
-        valid_records = process_employee_buffer(current_employee)
-        all_records.extend(valid_records)
+    """Extrait les données quotidiennes d'un seul fichier (hors OUVRIER) sous forme de liste d'enregistrements."""
+    records = load_file_records(file_path)
+    return select_daily_records(records).to_dict('records')
 
-    except Exception as e:
-        print(f"Erreur lors de l'ouverture du fichier {os.path.basename(file_path)} : {e}")
-        return []
-    
-    return all_records
+def analyze_rows(df):
+    """
+    Calcule en colonnes les indicateurs pour retard, pas de déjeuner, heures et demi-journée.
+    Retourne des tableaux (late_930, late_1000, late_1400, no_lunch, hours_worked, is_half_day) alignés sur df.
+    """
+    minutes = scan_matrix(df)
+    counts = df['scan_count'].to_numpy()
+    first, last = first_and_last_scan(minutes, counts)
 
-def analyze_row(row):
-    """Calcule les indicateurs pour retard, pas de déjeuner, heures et demi-journée."""
-    scans = re.findall(r'\d{1,2}:\d{2}', str(row.get('raw_pointages', '')))
-    
-    # Initialiser les valeurs par défaut
-    late_930 = False
-    late_1000 = False
-    late_1400 = False
-    no_lunch = False
-    is_half_day = False
-    hours_worked = 0.0
-
-    if not scans:
-        return late_930, late_1000, late_1400, no_lunch, hours_worked, is_half_day
-    
     # --- CALCUL DE DURÉE ---
-    total_seconds = 0
-    for i in range(0, len(scans) - 1, 2):
-        t_in = datetime.strptime(scans[i], '%H:%M')
-        t_out = datetime.strptime(scans[i+1], '%H:%M')
-        if t_out < t_in: t_out += timedelta(days=1)
-        total_seconds += (t_out - t_in).total_seconds()
-        
-    hours_worked = round(total_seconds / 3600, 2)
-    
+    hours_worked = worked_hours(minutes, counts)
+
     # --- LOGIQUE DE RETARD (Hiérarchie Stricte) ---
-    first_scan_dt = datetime.strptime(scans[0], '%H:%M')
-    
-    limit_930 = first_scan_dt.replace(hour=9, minute=30, second=0)
-    limit_1000 = first_scan_dt.replace(hour=10, minute=0, second=0)
-    limit_1400 = first_scan_dt.replace(hour=14, minute=0, second=0)
-
-    # Priorité 1 : Retard après 14:00 (Prend le dessus)
-    if first_scan_dt > limit_1400:
-        late_1400 = True
-        late_1000 = False # Assurer aucune duplication
-        late_930 = False
-    # Priorité 2 : Retard après 10:00 (mais avant 14:00)
-    elif first_scan_dt > limit_1000:
-        late_1400 = False
-        late_1000 = True
-        late_930 = False
-    # Priorité 3 : Retard après 09:30 (mais avant 10:00)
-    elif first_scan_dt > limit_930:
-        late_1400 = False
-        late_1000 = False
-        late_930 = True
+    late_930, late_1000, late_1400 = lateness_flags(first, counts)
 
     # --- VÉRIFICATION PAS DE DÉJEUNER ---
     # Si début d'après-midi, Pas de Déjeuner n'est pas applicable/déjà signalé par Retard 14h
-    if late_1400:
-        no_lunch = False
-    else:
-        no_lunch = len(scans) < 4 and len(scans) > 0
-    
+    no_lunch = ~late_1400 & (counts > 0) & (counts < 4)
+
     # --- LOGIQUE DEMI-JOURNÉE ---
     # Règles : 
     # 1. Pas Samedi.
     # 2. Entrée >= 13:00 (Après-midi Seulement) OU (Sortie <= 14:00 ET Heures < 7) (Matin Seulement)
+    is_saturday = df['day_str'].astype(str).str.lower().str.startswith('sa').to_numpy()
+    eligible = ~is_saturday & (counts >= 2) & (hours_worked > 0)
+    is_half_day = half_day_flags(first, last, hours_worked, eligible)
+
+    return late_930, late_1000, late_1400, no_lunch, hours_worked, is_half_day
+
+def compute_daily_flags(df):
+    """Ajoute à df les indicateurs quotidiens (retards, pas de déjeuner, heures, demi-journée, moins de 8h/4h)."""
+    late_930, late_1000, late_1400, no_lunch, hours_worked, is_half_day = analyze_rows(df)
+    
+    df['is_late_930'] = late_930
+    df['is_late_1000'] = late_1000
+    df['is_late_1400'] = late_1400
+    df['no_lunch'] = no_lunch
+    df['hours_worked'] = hours_worked
+    df['is_half_day'] = is_half_day
     
-    day_str = str(row.get('day_str', '')).lower()
-    is_saturday = day_str.startswith('sa')
+    if 'day_str' in df.columns:
+        mask_saturday = df['day_str'].astype(str).str.startswith('Sa')
+        df.loc[mask_saturday, 'no_lunch'] = False
 
-    if not is_saturday and len(scans) >= 2 and hours_worked > 0:
-        t_first = datetime.strptime(scans[0], '%H:%M')
-        t_last = datetime.strptime(scans[-1], '%H:%M')
-        
-        # Gérer la logique de quart de nuit au cas où
-        if t_last < t_first: 
-            t_last += timedelta(days=1)
-            
-        limit_1300 = t_first.replace(hour=13, minute=0, second=0)
-        # Redéfinir limit_1400 basé sur t_first pour la cohérence du type d'objet, bien que les heures comptent le plus
-        limit_1400_exit = t_first.replace(hour=14, minute=0, second=0)
-        
-        # Condition A : Entré >= 13:00 (Quart d'après-midi / Retard)
-        cond_afternoon = (t_first >= limit_1300)
-        
-        # Condition B : Parti <= 14:00 (Quart de matin / Départ anticipé) ET Heures < 7
-        cond_morning = (t_last <= limit_1400_exit) and (hours_worked < 7.0)
-        
-        if cond_afternoon or cond_morning:
-            is_half_day = True
+    df['target_hours'] = df['day_str'].apply(lambda x: 4.0 if str(x).startswith('Sa') else 8.0)
+    df['is_under_hours'] = (df['scan_count'] > 0) & (df['hours_worked'] < df['target_hours'])
+    return df
+
+def aggregate_monthly_stats(df):
+    """
+    Compte par employé les indicateurs des jours travaillés (heures > 0).
+    Retourne (statistiques jours de semaine, statistiques samedis).
+    """
+    valid_days_df = df[df['hours_worked'] > 0]
     
-    return late_930, late_1000, late_1400, no_lunch, hours_worked, is_half_day
+    saturday_records = valid_days_df[valid_days_df['day_str'].str.startswith('Sa')]
+    weekday_records = valid_days_df[~valid_days_df['day_str'].str.startswith('Sa')]
+    
+    monthly_stats_weekday = weekday_records.groupby('name', observed=True)[STATS_COLUMNS].sum()
+    monthly_stats_weekday['total_attendance'] = weekday_records.groupby('name', observed=True).size()
+    monthly_stats_weekday['is_under_hours'] = weekday_records.groupby('name', observed=True)['is_under_hours'].sum()
+    
+    monthly_stats_saturday = saturday_records.groupby('name', observed=True)[STATS_COLUMNS].sum()
+    monthly_stats_saturday['total_attendance'] = saturday_records.groupby('name', observed=True).size()
+    monthly_stats_saturday['is_under_hours'] = saturday_records.groupby('name', observed=True)['is_under_hours'].sum()
+    
+    return monthly_stats_weekday, monthly_stats_saturday
+
+def day_fingerprint(day_rows):
+    """
+    Empreinte des lignes d'un jour (indépendante de leur ordre) : nombre de lignes et somme des hachages
+    des noms, jours et scans. Un jour complété, corrigé ou dont la population change n'a plus la même empreinte.
+    """
+    width = max(1, int(day_rows['scan_count'].max()))
+    cols = ['name', 'day_str', 'scan_count'] + scan_columns(day_rows)[:width]
+    hashes = pd.util.hash_pandas_object(day_rows[cols], index=False).to_numpy()
+    return len(day_rows), int(hashes.sum())
+
+def sum_monthly_stats(parts):
+    """Additionne par employé des statistiques partielles (une par jour)."""
+    parts = [part for part in parts if not part.empty]
+    if not parts:
+        empty = pd.DataFrame(columns=STATS_COLUMNS + ['total_attendance', 'is_under_hours'])
+        empty.index.name = 'name'
+        return empty
+    return pd.concat(parts).groupby(level=0, observed=True).sum()
+
+def incremental_monthly_stats(df, state_path):
+    """
+    Mode incrémental : les statistiques partielles de chaque jour sont conservées dans state_path.
+    Seuls les jours nouveaux ou modifiés (empreinte différente, ex. dernier jour auparavant incomplet)
+    sont recalculés ; les jours absents de df sont oubliés.
+    Retourne (statistiques jours de semaine, statistiques samedis), identiques au calcul complet.
+    """
+    state = {}
+    if os.path.exists(state_path):
+        try:
+            with open(state_path, 'rb') as f:
+                state = pickle.load(f)
+        except Exception as e:
+            print(f"État incrémental illisible, recalcul complet : {e}")
+            state = {}
+
+    new_state = {}
+    recomputed = []
+    for day, day_rows in df.groupby('day_numeric', sort=False):
+        fingerprint = day_fingerprint(day_rows)
+        entry = state.get(day)
+        if entry is None or entry['fingerprint'] != fingerprint:
+            weekday_stats, saturday_stats = aggregate_monthly_stats(compute_daily_flags(day_rows.copy()))
+            entry = {'fingerprint': fingerprint, 'weekday': weekday_stats, 'saturday': saturday_stats}
+            recomputed.append(day)
+        new_state[day] = entry
+
+    print(f"Mode incrémental : {len(recomputed)} jour(s) recalculé(s) {recomputed}, {len(new_state) - len(recomputed)} repris de l'état.")
+
+    try:
+        os.makedirs(os.path.dirname(state_path), exist_ok=True)
+        tmp_path = f"{state_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(new_state, f)
+        os.replace(tmp_path, state_path)
+    except Exception as e:
+        print(f"Impossible d'enregistrer l'état incrémental : {e}")
+
+    return (
+        sum_monthly_stats([entry['weekday'] for entry in new_state.values()]),
+        sum_monthly_stats([entry['saturday'] for entry in new_state.values()])
+    )
 
 def create_category_dataframe(daily_df, monthly_stats, monthly_stats_saturday, flag_column, output_header):
     """Crée un DataFrame à 3 colonnes : [Nom, Compte, %]"""
@@ -343,36 +207,38 @@ def create_category_dataframe(daily_df, monthly_stats, monthly_stats_saturday, f
     result.columns = [output_header, 'Count', '%']
     return result
 
-def process_daily_analysis(input_dir, output_dir):
+@profiled
+def process_daily_analysis(input_dir, output_dir, records=None, max_workers=None, incremental=False, state_dir=None,
+                           constant_memory=None, profiler=None):
     """
     Traite les fichiers dans input_dir et sauvegarde l'analyse dans output_dir.
-    Retourne le chemin du fichier généré ou None.
+    input_dir peut aussi être une liste de fichiers en mémoire (fichiers téléversés) ;
+    avec output_dir=None, le rapport est produit en mémoire (BytesIO nommé) au lieu d'un fichier.
+    Si records (table partagée de pointage_records.load_records) est fourni, les fichiers ne sont pas relus ;
+    sinon max_workers fixe le nombre de processus de lecture (voir EXTRACTION_WORKERS).
+    Avec incremental=True, seuls les jours nouveaux ou modifiés depuis la dernière exécution sont recalculés
+    (état conservé dans state_dir, par défaut ETAT_INCREMENTAL_DIR).
+    constant_memory force ou désactive le mode mémoire constante de l'export (par défaut selon la taille).
+    profiler (stage_profiler.StageProfiler) reçoit la durée, le temps CPU et le pic mémoire de chaque étape.
+    Retourne le chemin du fichier généré (ou le BytesIO) ou None.
     """
-    if not os.path.exists(input_dir):
-        print(f"Dossier non trouvé : {input_dir}")
-        return None
-    
-    # S'assurer que le dossier de sortie existe
-    if not os.path.exists(output_dir):
+    if records is None:
+        if not inputs_exist(input_dir):
+            print(f"Dossier non trouvé : {input_dir}")
+            return None
+        records = load_records(input_dir, max_workers=max_workers, profiler=profiler)
+
+    # S'assurer que le dossier de sortie existe (sauf export en mémoire)
+    if output_dir is not None and not os.path.exists(output_dir):
         os.makedirs(output_dir)
 
-    all_data = []
+    profiler.begin('filtrage ouvriers')
+    df = select_daily_records(records)
 
-    # --- LIRE LES DONNÉES ---
-    print("Analyse des fichiers...")
-    for file in os.listdir(input_dir):
-        # Ignorer les fichiers temporaires Streamlit ou autres
-        if file.lower().endswith(('.xls', '.xlsx')) and not file.startswith("Daily_Analysis") and not file.startswith("Monthly") and not file.startswith("Master") and not file.startswith("~$"):
-            print(f"Lecture : {file}...")
-            full_path = os.path.join(input_dir, file)
-            records = extract_daily_data(full_path)
-            all_data.extend(records)
-
-    if not all_data:
+    if df.empty:
         print("Aucune donnée valide trouvée.")
         return None
 
-    df = pd.DataFrame(all_data)
 
     # --- EXCLURE LES EMPLOYÉS PAR NOM ---
     if EMPLOYES_EXCLUS:
@@ -387,6 +253,7 @@ def process_daily_analysis(input_dir, output_dir):
         return None
 
     # --- DÉTECTION CHRONOLOGIQUE AMÉLIORÉE ---
+    profiler.begin('détection de période')
     if 'day_numeric' in df.columns and not df.empty:
         # 1. Récupérer les infos de base
         month_num = df['month_num'].iloc[0] if 'month_num' in df.columns else '01'
@@ -448,45 +315,24 @@ def process_daily_analysis(input_dir, output_dir):
         print("Erreur: Aucune donnée numérique de jour trouvée.")
         return None
 
-    # --- CALCUL DES MÉTRIQUES ---
+    # --- CALCUL DES MÉTRIQUES ET STATISTIQUES ---
     print("\nCalcul des métriques...")
-    results = df.apply(analyze_row, axis=1)
-    
-    df['is_late_930'] = [x[0] for x in results]
-    df['is_late_1000'] = [x[1] for x in results]
-    df['is_late_1400'] = [x[2] for x in results]
-    df['no_lunch'] = [x[3] for x in results]
-    df['hours_worked'] = [x[4] for x in results]
-    df['is_half_day'] = [x[5] for x in results] 
-    
-    if 'day_str' in df.columns:
-        mask_saturday = df['day_str'].astype(str).str.startswith('Sa')
-        df.loc[mask_saturday, 'no_lunch'] = False
-
-    df['target_hours'] = df['day_str'].apply(lambda x: 4.0 if str(x).startswith('Sa') else 8.0)
-    df['is_under_hours'] = (df['scan_count'] > 0) & (df['hours_worked'] < df['target_hours'])
-
-    # --- GÉNÉRATION DES STATISTIQUES ---
-    cols_to_sum = ['is_late_930', 'is_late_1000', 'is_late_1400', 'no_lunch', 'is_half_day']
-    
-    valid_days_df = df[df['hours_worked'] > 0]
-    
-    saturday_records = valid_days_df[valid_days_df['day_str'].str.startswith('Sa')]
-    weekday_records = valid_days_df[~valid_days_df['day_str'].str.startswith('Sa')]
-    
-    monthly_stats_weekday = weekday_records.groupby('name')[cols_to_sum].sum()
-    monthly_stats_weekday['total_attendance'] = weekday_records.groupby('name').size()
-    monthly_stats_weekday['is_under_hours'] = weekday_records.groupby('name')['is_under_hours'].sum()
-    
-    monthly_stats_saturday = saturday_records.groupby('name')[cols_to_sum].sum()
-    monthly_stats_saturday['total_attendance'] = saturday_records.groupby('name').size()
-    monthly_stats_saturday['is_under_hours'] = saturday_records.groupby('name')['is_under_hours'].sum()
+    profiler.begin('règles', lignes=len(df), mode='incrémental' if incremental else 'complet')
+    if incremental:
+        state_path = os.path.join(state_dir or ETAT_INCREMENTAL_DIR, f"etat_quotidien_{year_num}-{month_num}.pkl")
+        monthly_stats_weekday, monthly_stats_saturday = incremental_monthly_stats(df, state_path)
+        # Seul le jour cible a besoin de ses indicateurs ligne par ligne
+        flagged_df = compute_daily_flags(df[df['day_numeric'] == target_report_day].copy())
+    else:
+        flagged_df = compute_daily_flags(df)
+        monthly_stats_weekday, monthly_stats_saturday = aggregate_monthly_stats(flagged_df)
     
+    profiler.begin('agrégation')
     monthly_stats = monthly_stats_weekday.combine_first(monthly_stats_saturday)
     
     # --- FILTRER POUR LE JOUR CIBLE DU RAPPORT ---
-    if 'day_numeric' in df.columns:
-        daily_df = df[df['day_numeric'] == target_report_day].copy()
+    if 'day_numeric' in flagged_df.columns:
+        daily_df = flagged_df[flagged_df['day_numeric'] == target_report_day].copy()
     else:
         daily_df = pd.DataFrame()
 
@@ -513,6 +359,7 @@ def process_daily_analysis(input_dir, output_dir):
         main_list = pd.concat([df_under, df_half_day, df_no_lunch, df_late_10, df_late_930, df_late_1400], axis=1)
 
     # --- EXPORTER VERS EXCEL ---
+    profiler.begin('export Excel', lignes=len(main_list))
     # Calculer la plage de jours analysés
     if not df.empty and 'day_numeric' in df.columns:
         if has_transition:
@@ -524,19 +371,17 @@ def process_daily_analysis(input_dir, output_dir):
         
         # Créer un nom de fichier dynamique basé sur la période analysée
         dynamic_filename = f"POINTAGE ANALYSE DU {real_start_day:02d}-{month_num}-{year_num} A {real_end_day:02d}-{month_num}-{year_num}.xlsx"
-        output_path = os.path.join(output_dir, dynamic_filename)
+        output_path = report_target(output_dir, dynamic_filename)
         header_text = f"Analyse Quotidienne - Période : {real_start_day} au {real_end_day} {month_name} {year_num}"
     else:
         header_text = "Analyse Quotidienne - Période non spécifiée"
-        output_path = os.path.join(output_dir, NOM_FICHIER_SORTIE)
+        output_path = report_target(output_dir, NOM_FICHIER_SORTIE)
     
     try:
-        with pd.ExcelWriter(output_path, engine='xlsxwriter') as writer:
-            # Ajouter l'en-tête sur la première ligne
-            main_list.to_excel(writer, sheet_name='Analyse Quotidienne', index=False, header=False, startrow=2)
-            
+        constant_memory = use_constant_memory(len(main_list), constant_memory)
+        with excel_writer(output_path, constant_memory) as writer:
             workbook = writer.book
-            worksheet = writer.sheets['Analyse Quotidienne']
+            worksheet = workbook.add_worksheet('Analyse Quotidienne')
             
             # Format pour l'en-tête de période
             header_title = workbook.add_format({
@@ -544,12 +389,6 @@ def process_daily_analysis(input_dir, output_dir):
                 'font_size': 14, 'font_color': '#2F5597', 'border': 1
             })
             
-            # Écrire l'en-tête de période sur la première ligne (fusionnée)
-            if len(main_list.columns) > 1:
-                worksheet.merge_range(0, 0, 0, len(main_list.columns) - 1, header_text, header_title)
-            else:
-                worksheet.write(0, 0, header_text, header_title)
-            
             # Formats
             header_blue = workbook.add_format({
                 'bold': True, 'align': 'center', 'valign': 'vcenter',
@@ -568,8 +407,10 @@ def process_daily_analysis(input_dir, output_dir):
             body_center = workbook.add_format({'border': 1, 'align': 'center'})
             body_pct = workbook.add_format({'border': 1, 'align': 'center', 'num_format': '0%'})
 
-            max_rows = len(main_list)
             columns = main_list.columns.tolist()
+            header_styles = []
+            col_formats = []
+            col_values = []
 
             for i, col_name in enumerate(columns):
                 col_name_str = str(col_name)
@@ -589,8 +430,6 @@ def process_daily_analysis(input_dir, output_dir):
                 elif "Demi-Journée" in col_name_str:
                     header_style = header_orange
                 
-                worksheet.write(1, i, col_name, header_style)
-
                 col_data = main_list.iloc[:, i]
                 max_data_len = 0
                 if "%" in col_name_str:
@@ -603,14 +442,27 @@ def process_daily_analysis(input_dir, output_dir):
                 final_width = max(max_data_len, len(col_name_str)) + 4
                 worksheet.set_column(i, i, final_width)
 
-                for row_idx in range(max_rows):
-                    cell_val = main_list.iloc[row_idx, i]
-                    if pd.isna(cell_val):
-                        worksheet.write(row_idx + 2, i, "", col_format)
-                    else:
-                        worksheet.write(row_idx + 2, i, cell_val, col_format)
+                header_styles.append(header_style)
+                col_formats.append(col_format)
+                # Cellules vides : chaîne vide mise en forme (bordures conservées)
+                col_values.append(col_data.astype(object).where(col_data.notna(), "").tolist())
+
+            # Écrire l'en-tête de période sur la première ligne (fusionnée)
+            if len(columns) > 1:
+                worksheet.merge_range(0, 0, 0, len(columns) - 1, header_text, header_title)
+            else:
+                worksheet.write(0, 0, header_text, header_title)
+
+            for i, col_name in enumerate(columns):
+                worksheet.write(1, i, col_name, header_styles[i])
+
+            # Une seule écriture par cellule, colonne par colonne
+            write_columns(worksheet, 2, col_values, col_formats, constant_memory)
+
+        if not is_path(output_path):
+            output_path.seek(0)
 
-        print(f"\nSUCCÈS ! Rapport sauvegardé : {output_path}")
+        print(f"\nSUCCÈS ! Rapport sauvegardé : {output_path if is_path(output_path) else source_name(output_path)}")
         return output_path
 
     except Exception as e:
@@ -623,7 +475,7 @@ def main():
         return
     
     # Mode standalone (utilisation classique)
-    output = process_daily_analysis(CHEMIN_DOSSIER, CHEMIN_DOSSIER)
+    output = process_daily_analysis(CHEMIN_DOSSIER, CHEMIN_DOSSIER, incremental=MODE_INCREMENTAL)
     if output:
         print(f"Fichier généré : {output}")
 
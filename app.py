@@ -1,41 +1,201 @@
 import streamlit as st
 import os
-import shutil
+import hashlib
+import threading
 import importlib.util
 import sys
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from stage_profiler import StageProfiler
 
 # --- CONFIGURATION ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-TEMP_INPUT_DIR = os.path.join(BASE_DIR, "temp_input")
-TEMP_OUTPUT_DIR = os.path.join(BASE_DIR, "temp_output")
+# Étapes exécutées en parallèle (quotidienne, mensuelle, graphique)
+STAGE_WORKERS = 3
+# Nombre de résultats d'analyse gardés en mémoire, toutes sessions confondues (éviction LRU)
+RESULT_CACHE_MAX_ENTRIES = 16
+# Processus utilisés pour lire les fichiers téléversés en parallèle
+EXTRACTION_WORKERS = min(8, os.cpu_count() or 1)
+# Colonnes affichées dans le détail par employé (colonnes de employee_index.DETAIL_COLUMNS)
+DRILLDOWN_COLUMNS = {
+    'date': "Date", 'day_label': "Jour", 'service': "Service", 'hj_code': "HJ", 'raw_pointages': "Pointages",
+    'status': "Statut", 'first_scan': "Entrée", 'last_scan': "Sortie", 'hours_worked': "Heures",
+    'lunch_minutes': "Pause (min)", 'late_930': "> 9h30", 'late_1000': "> 10h", 'late_1400': "> 14h",
+    'half_day': "Demi-journée", 'source_file': "Fichier",
+}
 
 # --- IMPORT FUNCTIONS DYNAMICALLY ---
+@st.cache_resource(show_spinner=False)
+def module_loading_lock():
+    """
+    Verrou du chargement des scripts, un seul par processus (les variables globales du script
+    sont recréées à chaque rerun) : partagé par le pré-chargement (start_prewarm) et les sessions.
+    """
+    return threading.RLock()
+
 def load_module_from_path(module_name, file_path):
-    spec = importlib.util.spec_from_file_location(module_name, file_path)
-    module = importlib.util.module_from_spec(spec)
-    sys.modules[module_name] = module
-    spec.loader.exec_module(module)
-    return module
-
-# Charger les scripts d'analyse
-# "analysis_per_day+count.py" contient des caractères spéciaux, donc chargement dynamique nécessaire
-daily_script = load_module_from_path("daily_analysis", os.path.join(BASE_DIR, "analysis_per_day+count.py"))
-monthly_script = load_module_from_path("monthly_analysis", os.path.join(BASE_DIR, "analysis_per_month.py"))
-graph_script = load_module_from_path("lateness_graph", os.path.join(BASE_DIR, "late_arrivals_graph.py"))
+    # Un appel pendant le pré-chargement attend sa fin au lieu de recevoir un module à moitié initialisé
+    with module_loading_lock():
+        # Déjà chargé dans ce processus (rerun Streamlit) : réutiliser le module
+        if module_name in sys.modules:
+            return sys.modules[module_name]
+        spec = importlib.util.spec_from_file_location(module_name, file_path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[module_name] = module
+        try:
+            spec.loader.exec_module(module)
+        except BaseException:
+            # Échec du chargement : ne pas laisser le module incomplet aux appels suivants
+            sys.modules.pop(module_name, None)
+            raise
+        return module
+
+# Les scripts d'analyse (et pandas, openpyxl, xlrd, xlsxwriter, matplotlib) ne sont chargés qu'au premier besoin :
+# la page s'affiche sans attendre ces imports. Un pré-chargement en arrière-plan est lancé au démarrage.
+@st.cache_resource(show_spinner=False)
+def load_analysis_modules():
+    """
+    Charge une seule fois par processus les scripts d'analyse.
+    Retourne (pointage_records, analyse quotidienne, analyse mensuelle, graphique).
+    """
+    # Le lecteur partagé est chargé en premier pour que les scripts réutilisent le même module
+    records = load_module_from_path("pointage_records", os.path.join(BASE_DIR, "pointage_records.py"))
+    # "analysis_per_day+count.py" contient des caractères spéciaux, donc chargement dynamique nécessaire
+    daily = load_module_from_path("daily_analysis", os.path.join(BASE_DIR, "analysis_per_day+count.py"))
+    monthly = load_module_from_path("monthly_analysis", os.path.join(BASE_DIR, "analysis_per_month.py"))
+    graph = load_module_from_path("lateness_graph", os.path.join(BASE_DIR, "late_arrivals_graph.py"))
+    return records, daily, monthly, graph
+
+@st.cache_resource(show_spinner=False)
+def load_drilldown_modules():
+    """Charge une seule fois par processus l'index par employé et l'historique : (employee_index, attendance_store)."""
+    load_analysis_modules()
+    index = load_module_from_path("employee_index", os.path.join(BASE_DIR, "employee_index.py"))
+    store = load_module_from_path("attendance_store", os.path.join(BASE_DIR, "attendance_store.py"))
+    return index, store
+
+def excluded_employees():
+    """Noms exclus d'au moins un rapport : retirés aussi du détail par employé."""
+    _, daily_script, monthly_script, graph_script = load_analysis_modules()
+    return tuple(sorted(set(daily_script.EMPLOYES_EXCLUS) | set(monthly_script.EXCLUDED_EMPLOYEES) | set(graph_script.EMPLOYES_EXCLUS)))
+
+@st.cache_resource(show_spinner="Chargement de l'historique...", max_entries=1)
+def load_history_index(store_path, modified, excluded):
+    """
+    Index par employé de tout l'historique, reconstruit quand le fichier change (modified : date de modification)
+    ou quand la liste des noms exclus (excluded) change.
+    """
+    employee_index, attendance_store = load_drilldown_modules()
+    return employee_index.EmployeeIndex(attendance_store.query_records(store_path=store_path), excluded)
+
+@st.cache_resource(show_spinner=False)
+def start_prewarm():
+    """
+    Lance (une seule fois par processus) le chargement des scripts d'analyse en arrière-plan.
+    Le verrou de chargement (module_loading_lock) est créé avant le thread, qui le partage avec les sessions.
+    """
+    module_loading_lock()
+    thread = threading.Thread(target=load_analysis_modules, name="prewarm-analysis", daemon=True)
+    thread.start()
+    return thread
 
 # --- UTILS ---
-def reset_dirs():
-    """Réinitialise les dossiers temporaires."""
-    for folder in [TEMP_INPUT_DIR, TEMP_OUTPUT_DIR]:
-        if os.path.exists(folder):
-            try:
-                shutil.rmtree(folder)
-            except Exception as e:
-                st.error(f"Erreur lors du nettoyage du dossier {folder}: {e}")
-        os.makedirs(folder)
+@st.cache_resource
+def get_result_cache():
+    """Cache LRU des résultats d'analyse partagé par toutes les sessions : (OrderedDict, verrou)."""
+    return OrderedDict(), threading.Lock()
+
+def analysis_config():
+    """Paramètres qui influencent les rapports : un changement invalide les résultats en cache."""
+    records_module, daily_script, monthly_script, graph_script = load_analysis_modules()
+    # Calendrier des jours ouvrés de l'analyse mensuelle (module déjà chargé par celle-ci)
+    calendar = load_module_from_path("business_calendar", os.path.join(BASE_DIR, "business_calendar.py"))
+    return (
+        records_module.PARSER_VERSION,
+        tuple(records_module.CODES_OUVRIER),
+        tuple(daily_script.EMPLOYES_EXCLUS),
+        tuple(monthly_script.EXCLUDED_EMPLOYEES),
+        tuple(graph_script.EMPLOYES_EXCLUS),
+        calendar.WEEKMASK,
+        tuple(calendar.PUBLIC_HOLIDAYS),
+    )
+
+def result_cache_key(uploaded_files):
+    """Clé des résultats : empreinte du contenu et du nom des fichiers (dans l'ordre du téléversement) et de la configuration."""
+    digest = hashlib.sha256(repr(analysis_config()).encode('utf-8'))
+    for uploaded_file in uploaded_files:
+        digest.update(uploaded_file.name.encode('utf-8') + b"\0")
+        digest.update(hashlib.sha256(uploaded_file.getvalue()).digest())
+    return digest.hexdigest()
+
+def get_cached_result(key):
+    """Retourne (sorties, messages, profils, index par employé) d'une analyse déjà faite, ou None."""
+    cache, lock = get_result_cache()
+    with lock:
+        if key not in cache:
+            return None
+        cache.move_to_end(key)
+        return cache[key]
+
+def store_result(key, outputs, messages, profiles, index):
+    """Conserve le résultat d'une analyse et évince les entrées les moins récemment utilisées."""
+    cache, lock = get_result_cache()
+    with lock:
+        cache[key] = (outputs, messages, profiles, index)
+        cache.move_to_end(key)
+        while len(cache) > RESULT_CACHE_MAX_ENTRIES:
+            cache.popitem(last=False)
+
+def show_message(kind, text):
+    """Affiche un message d'étape ('success', 'warning' ou 'error')."""
+    getattr(st, kind)(text)
+
+def show_employee_drilldown(index):
+    """Détail d'un employé sur une période : totaux puis une ligne par jour (scans, heures, retards, statut)."""
+    employee_index, _ = load_drilldown_modules()
+    employees = index.employees()
+    if employees.empty:
+        st.info("Aucune ligne datée à consulter.")
+        return
+
+    col_name, col_matricule, col_period = st.columns([2, 1, 2])
+    labels = dict(zip(employees['name'], employees['matricule']))
+    name = col_name.selectbox(
+        "Employé", employees['name'],
+        format_func=lambda n: f"{n} ({labels[n]})" if labels[n] else n
+    )
+    matricule = col_matricule.text_input("ou matricule", "").strip()
+    first_date = employees['first_date'].min().date()
+    last_date = employees['last_date'].max().date()
+    period = col_period.date_input(
+        "Période", value=(first_date, last_date), min_value=first_date, max_value=last_date, format="DD/MM/YYYY"
+    )
+    # Pendant la sélection de la période, une seule date est choisie : la fin reste ouverte
+    start, end = (tuple(period) + (None,))[:2] if period else (None, None)
+
+    if matricule:
+        details = index.query(matricule=matricule, start=start, end=end)
+    else:
+        details = index.query(name=name, start=start, end=end)
+    if st.checkbox("Retards uniquement", value=False):
+        details = details[details['late_930'] | details['late_1000'] | details['late_1400']]
+    if details.empty:
+        st.info("Aucun jour pour cet employé sur cette période.")
+        return
+
+    totals = index.summarize(details)
+    for column, (label, value) in zip(st.columns(len(totals)), totals.items()):
+        column.metric(label, value)
+
+    view = details[list(DRILLDOWN_COLUMNS)].copy()
+    view['first_scan'] = employee_index.minutes_to_hhmm(view['first_scan'])
+    view['last_scan'] = employee_index.minutes_to_hhmm(view['last_scan'])
+    view['date'] = view['date'].dt.strftime('%d/%m/%Y')
+    st.dataframe(view.rename(columns=DRILLDOWN_COLUMNS), hide_index=True, use_container_width=True)
 
 # --- STREAMLIT APP ---
 st.set_page_config(page_title="RH Analysis Tool", page_icon="📊", layout="wide")
+start_prewarm()
 
 st.title("📊 RH Data Analysis Automation")
 st.markdown("""
@@ -48,6 +208,9 @@ Cette application permet d'automatiser l'analyse des pointages.
 # 1. File Upload
 uploaded_files = st.file_uploader("Déposez vos fichiers Excel ici (.xlsx, .xls)", type=['xlsx', 'xls'], accept_multiple_files=True)
 
+# Le suivi mémoire (tracemalloc) ralentit nettement la lecture : activé à la demande
+trace_memory = st.sidebar.checkbox("Mesurer le pic mémoire des étapes (plus lent)", value=False)
+
 if st.button("🚀 Lancer l'Analyse", type="primary"):
     if not uploaded_files:
         st.warning("Veuillez d'abord téléverser des fichiers.")
@@ -56,57 +219,95 @@ if st.button("🚀 Lancer l'Analyse", type="primary"):
         progress_bar = st.progress(0)
         status_text = st.empty()
 
-        # Step 1: Prep Environment
-        status_text.text("Préparation de l'environnement...")
-        reset_dirs()
-        progress_bar.progress(10)
-
-        # Step 2: Save Files
-        status_text.text(f"Sauvegarde de {len(uploaded_files)} fichiers...")
-        for uploaded_file in uploaded_files:
-            file_path = os.path.join(TEMP_INPUT_DIR, uploaded_file.name)
-            with open(file_path, "wb") as f:
-                f.write(uploaded_file.getbuffer())
-        progress_bar.progress(30)
-
-        # Step 3: Run Daily Analysis
-        status_text.text("Exécution de l'analyse quotidienne...")
-        try:
-            daily_output = daily_script.process_daily_analysis(TEMP_INPUT_DIR, TEMP_OUTPUT_DIR)
-            if daily_output:
-                st.success(f"✅ Analyse Quotidienne générée : {os.path.basename(daily_output)}")
-            else:
-                st.warning("⚠️ L'analyse quotidienne n'a rien généré (vérifiez les données).")
-        except Exception as e:
-            st.error(f"Erreur Analyse Quotidienne: {e}")
-        progress_bar.progress(50)
-
-        # Step 4: Run Monthly Analysis
-        status_text.text("Exécution de l'analyse mensuelle...")
-        try:
-            monthly_output = monthly_script.process_monthly_analysis(TEMP_INPUT_DIR, TEMP_OUTPUT_DIR)
-            if monthly_output:
-                st.success(f"✅ Analyse Mensuelle générée : {os.path.basename(monthly_output)}")
-            else:
-                st.warning("⚠️ L'analyse mensuelle n'a rien généré.")
-        except Exception as e:
-            st.error(f"Erreur Analyse Mensuelle: {e}")
-        progress_bar.progress(70)
-
-        # Step 5: Generate Graph
-        status_text.text("Génération du graphique des retards...")
-        graph_output = None
-        try:
-            graph_output = graph_script.generate_lateness_graph(TEMP_INPUT_DIR, TEMP_OUTPUT_DIR)
-            if graph_output:
-                st.success(f"✅ Graphique généré : {os.path.basename(graph_output)}")
-            else:
-                st.warning("⚠️ Impossible de générer le graphique.")
-        except Exception as e:
-            st.error(f"Erreur Graphique: {e}")
-        progress_bar.progress(90)
-
-        # Step 6: Finalize
+        # Scripts d'analyse : déjà en mémoire si le pré-chargement est terminé, sinon on attend la fin du chargement
+        records_module, daily_script, monthly_script, graph_script = load_analysis_modules()
+
+        # Résultat déjà calculé pour ces fichiers et cette configuration : réutilisé sans rien recalculer
+        cache_key = result_cache_key(uploaded_files)
+        cached = get_cached_result(cache_key)
+        if cached is not None:
+            outputs, messages, profiles, index = cached
+            status_text.text("Résultats repris du cache...")
+            for message in messages:
+                show_message(*message)
+        else:
+            outputs = {}
+            messages = []
+            failed = False
+            # Un profiler par traitement : durée, temps CPU et pic mémoire de chaque étape
+            profilers = {
+                key: StageProfiler(label, trace_memory=trace_memory)
+                for key, label in [('parse', "Lecture"), ('daily', "Analyse Quotidienne"),
+                                   ('monthly', "Analyse Mensuelle"), ('graph', "Graphique")]
+            }
+
+            # Step 1: Parse Files Once, directement depuis les fichiers téléversés (aucun dossier temporaire)
+            status_text.text(f"Lecture de {len(uploaded_files)} fichiers de pointage...")
+            records = records_module.load_records(
+                uploaded_files, max_workers=EXTRACTION_WORKERS, profiler=profilers['parse']
+            )
+            progress_bar.progress(30)
+
+            # Step 2: Run the three analyses concurrently
+            # Les étapes ne partagent que la table records (lecture seule) ; chaque résultat est affiché dès qu'il est prêt.
+            # Les rapports sont produits en mémoire (output_dir=None) et proposés directement au téléchargement
+            status_text.text("Exécution des analyses (quotidienne, mensuelle, graphique)...")
+            stages = {
+                'daily': (
+                    "Analyse Quotidienne", "✅ Analyse Quotidienne générée",
+                    "⚠️ L'analyse quotidienne n'a rien généré (vérifiez les données).",
+                    lambda: daily_script.process_daily_analysis(
+                        uploaded_files, None, records=records, profiler=profilers['daily']
+                    )
+                ),
+                'monthly': (
+                    "Analyse Mensuelle", "✅ Analyse Mensuelle générée",
+                    "⚠️ L'analyse mensuelle n'a rien généré.",
+                    lambda: monthly_script.process_monthly_analysis(
+                        uploaded_files, None, records=records, profiler=profilers['monthly']
+                    )
+                ),
+                'graph': (
+                    "Graphique", "✅ Graphique généré",
+                    "⚠️ Impossible de générer le graphique.",
+                    lambda: graph_script.generate_lateness_graph(
+                        uploaded_files, None, records=records, render='apercu', profiler=profilers['graph']
+                    )
+                ),
+            }
+            with ThreadPoolExecutor(max_workers=STAGE_WORKERS) as pool:
+                futures = {pool.submit(run): key for key, (*_, run) in stages.items()}
+                for done, future in enumerate(as_completed(futures), start=1):
+                    key = futures[future]
+                    label, success_message, empty_message, _ = stages[key]
+                    try:
+                        outputs[key] = future.result()
+                        if outputs[key]:
+                            messages.append(('success', f"{success_message} : {outputs[key].name}"))
+                        else:
+                            messages.append(('warning', empty_message))
+                    except Exception as e:
+                        failed = True
+                        messages.append(('error', f"Erreur {label}: {e}"))
+                    show_message(*messages[-1])
+                    progress_bar.progress(30 + 60 * done // len(stages))
+
+            profiles = [(profiler.name, profiler.rows()) for profiler in profilers.values()]
+
+            # Index par employé de la table lue, pour le détail par employé (conservé dans la session)
+            employee_index, _ = load_drilldown_modules()
+            index = employee_index.EmployeeIndex(records, excluded_employees())
+
+            # Les analyses en erreur ne sont pas mises en cache : un nouveau clic les relance
+            if not failed:
+                store_result(cache_key, outputs, messages, profiles, index)
+
+        st.session_state['employee_index'] = index
+
+        graph_output = outputs.get('graph')
+        reports = [outputs[key] for key in ('daily', 'monthly') if outputs.get(key)]
+
+        # Step 3: Finalize
         status_text.text("Finalisation...")
         progress_bar.progress(100)
         
@@ -114,33 +315,52 @@ if st.button("🚀 Lancer l'Analyse", type="primary"):
         st.header("📂 Résultats")
 
         # Display Graph
-        if graph_output and os.path.exists(graph_output):
-            st.image(graph_output, caption="Graphique des Retards (>10h)", use_container_width=True)
-            with open(graph_output, "rb") as file:
-                st.download_button(
-                    label="⬇️ Télécharger le Graphique (PNG)",
-                    data=file,
-                    file_name=os.path.basename(graph_output),
-                    mime="image/png"
-                )
+        # Aperçu à la résolution de l'écran ; l'image pleine résolution n'est rendue qu'au téléchargement
+        if graph_output:
+            st.image(graph_output.getvalue(), caption="Graphique des Retards (>10h)", use_container_width=True)
+            st.download_button(
+                label="⬇️ Télécharger le Graphique (PNG)",
+                data=getattr(graph_output, 'full_resolution', graph_output.getvalue()),
+                file_name=graph_output.name,
+                mime="image/png"
+            )
 
         # List Excel Files
         st.subheader("Rapports Excel")
-        files_found = False
-        if os.path.exists(TEMP_OUTPUT_DIR):
-            for f in os.listdir(TEMP_OUTPUT_DIR):
-                if f.endswith(".xlsx") and not f.startswith("~$"):
-                    files_found = True
-                    file_path = os.path.join(TEMP_OUTPUT_DIR, f)
-                    with open(file_path, "rb") as file:
-                        st.download_button(
-                            label=f"⬇️ Télécharger {f}",
-                            data=file,
-                            file_name=f,
-                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                        )
-        
-        if not files_found:
-            st.info("Aucun rapport Excel n'a été trouvé dans le dossier de sortie.")
+        for report in reports:
+            st.download_button(
+                label=f"⬇️ Télécharger {report.name}",
+                data=report.getvalue(),
+                file_name=report.name,
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            )
+
+        if not reports:
+            st.info("Aucun rapport Excel n'a été généré.")
+
+        # Profil des étapes : quelle étape a coûté le plus cher
+        title = "⏱️ Profil des étapes" + (" (exécution d'origine, résultats repris du cache)" if cached is not None else "")
+        with st.expander(title):
+            for label, rows in profiles:
+                if rows:
+                    st.markdown(f"**{label}** — {sum(row['Durée (s)'] for row in rows):.2f} s")
+                    st.dataframe(rows, hide_index=True, use_container_width=True)
+
+# 4. Détail par employé : reste disponible après l'analyse (index conservé dans la session)
+st.divider()
+st.header("🔎 Détail par employé")
+source = st.radio("Source", ["Fichiers analysés", "Historique"], horizontal=True)
+if source == "Historique":
+    _, attendance_store = load_drilldown_modules()
+    if os.path.exists(attendance_store.STORE_PATH):
+        show_employee_drilldown(load_history_index(
+            attendance_store.STORE_PATH, os.path.getmtime(attendance_store.STORE_PATH), excluded_employees()
+        ))
+    else:
+        st.info("Historique vide : importez des exports avec « python attendance_store.py import <dossier> ».")
+elif 'employee_index' in st.session_state:
+    show_employee_drilldown(st.session_state['employee_index'])
+else:
+    st.info("Lancez une analyse pour consulter le détail d'un employé.")
 
 st.sidebar.info("Application créée pour l'automatisation RH.")
@@ -0,0 +1,251 @@
+import os
+import time
+import sqlite3
+import argparse
+import numpy as np
+import pandas as pd
+import parse_cache
+from datetime import date
+from pointage_records import (
+    PARSER_VERSION, RECORD_COLUMNS, add_scan_columns, categorize, input_sources, is_input_file,
+    is_path, load_file_records, scan_matrix, source_name
+)
+
+# --- CONFIGURATION ---
+# Historique persistant des enregistrements employé-jour (un fichier SQLite local)
+STORE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pointage_history.sqlite")
+
+# Version du schéma : à incrémenter à chaque changement des tables (l'historique est alors à réimporter)
+SCHEMA_VERSION = 2
+
+# Un fichier importé = une ligne de 'files' ; ses lignes de jour sont dans 'records', dans l'ordre du fichier.
+# Un fichier est identifié par son chemin complet (source_path) : les noms d'export ne portent que le mois,
+# deux sites ont donc souvent des fichiers de même nom (source_file). Un contenu déjà importé n'est pas réimporté.
+# Les dates sont stockées au format ISO (AAAA-MM-JJ) : l'ordre des chaînes est l'ordre chronologique.
+# Les scans de chaque ligne sont stockés en int16 bout à bout (scan_count valeurs).
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS files (
+    file_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source_path TEXT NOT NULL UNIQUE,
+    source_file TEXT NOT NULL,
+    content_key TEXT NOT NULL UNIQUE,
+    imported_at REAL NOT NULL,
+    row_count INTEGER NOT NULL,
+    first_date TEXT,
+    last_date TEXT
+);
+CREATE TABLE IF NOT EXISTS records (
+    file_id INTEGER NOT NULL REFERENCES files(file_id) ON DELETE CASCADE,
+    row_order INTEGER NOT NULL,
+    {', '.join(f'{column} {"INTEGER" if column in ("employee_seq", "day_numeric", "scan_count") else "TEXT"}' for column in RECORD_COLUMNS)},
+    scans BLOB NOT NULL,
+    PRIMARY KEY (file_id, row_order)
+);
+CREATE INDEX IF NOT EXISTS idx_records_name_date ON records (name, date);
+CREATE INDEX IF NOT EXISTS idx_records_service_date ON records (service, date);
+CREATE INDEX IF NOT EXISTS idx_records_date ON records (date);
+PRAGMA user_version = {SCHEMA_VERSION};
+"""
+
+DATE_COLUMNS = ['date', 'full_date']
+
+def connect(store_path=None):
+    """Ouvre l'historique (créé au besoin) et retourne la connexion SQLite."""
+    store_path = store_path or STORE_PATH
+    directory = os.path.dirname(os.path.abspath(store_path))
+    os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(store_path)
+    conn.execute("PRAGMA foreign_keys = ON")
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version not in (0, SCHEMA_VERSION):
+        conn.close()
+        raise RuntimeError(
+            f"Historique {store_path} au schéma v{version} (attendu v{SCHEMA_VERSION}) : supprimez-le et réimportez les fichiers."
+        )
+    if version == 0:
+        # Création du schéma (une seule fois : une lecture ne modifie pas le fichier)
+        conn.executescript(SCHEMA)
+    return conn
+
+def _iso_dates(values):
+    """Colonne de dates -> chaînes ISO (None pour les dates manquantes)."""
+    return [None if pd.isna(value) else value.strftime('%Y-%m-%d') for value in values]
+
+def _scan_blobs(records):
+    """Scans de chaque ligne (scan_count premières valeurs de la matrice) en int16 bout à bout."""
+    matrix = scan_matrix(records).astype('<i2')
+    counts = records['scan_count'].to_numpy()
+    return [matrix[i, :count].tobytes() for i, count in enumerate(counts)]
+
+def source_path(source):
+    """
+    Identifiant d'un fichier dans l'historique : chemin absolu sur disque (le dossier distingue les sites),
+    ou nom d'un fichier en mémoire.
+    """
+    return os.path.abspath(source) if is_path(source) else source_name(source)
+
+def store_file_records(conn, path, content_key, records):
+    """
+    Enregistre la table d'un fichier, en remplaçant un import précédent du même fichier (même chemin, voir source_path).
+    À appeler dans une transaction (with conn:).
+    """
+    conn.execute("DELETE FROM files WHERE source_path = ?", (path,))
+    dates = records['date'].dropna()
+    cursor = conn.execute(
+        "INSERT INTO files (source_path, source_file, content_key, imported_at, row_count, first_date, last_date) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (
+            path, os.path.basename(path), content_key, time.time(), len(records),
+            dates.min().strftime('%Y-%m-%d') if not dates.empty else None,
+            dates.max().strftime('%Y-%m-%d') if not dates.empty else None,
+        )
+    )
+    file_id = cursor.lastrowid
+
+    columns = {column: records[column].tolist() for column in RECORD_COLUMNS}
+    for column in DATE_COLUMNS:
+        columns[column] = _iso_dates(records[column])
+    for column in ['employee_seq', 'day_numeric', 'scan_count']:
+        columns[column] = [int(value) for value in columns[column]]
+
+    rows = zip(
+        [file_id] * len(records), range(len(records)),
+        *(columns[column] for column in RECORD_COLUMNS),
+        _scan_blobs(records)
+    )
+    placeholders = ", ".join("?" * (len(RECORD_COLUMNS) + 3))
+    conn.executemany(
+        f"INSERT INTO records (file_id, row_order, {', '.join(RECORD_COLUMNS)}, scans) VALUES ({placeholders})",
+        rows
+    )
+
+def import_sources(input_dir, store_path=None):
+    """
+    Importe dans l'historique les exports de input_dir (dossier ou liste de fichiers en mémoire).
+    Un fichier au contenu déjà importé (même chemin ou copie ailleurs) n'est pas relu ;
+    un fichier modifié remplace son import précédent (même chemin, voir source_path).
+    Retourne (fichiers importés, fichiers inchangés).
+    """
+    imported, unchanged = [], []
+    conn = connect(store_path)
+    try:
+        known_keys = {key for (key,) in conn.execute("SELECT content_key FROM files")}
+        for file, source in input_sources(input_dir):
+            if not is_input_file(file):
+                continue
+            key = parse_cache.cache_key(source, PARSER_VERSION)
+            if key in known_keys:
+                unchanged.append(file)
+                continue
+            print(f"Import : {file}...")
+            records = load_file_records(source)
+            if records.empty:
+                print(f"Aucune ligne de jour dans {file} : ignoré.")
+                continue
+            with conn:
+                store_file_records(conn, source_path(source), key, records)
+            known_keys.add(key)
+            imported.append(file)
+    finally:
+        conn.close()
+    return imported, unchanged
+
+def query_records(start=None, end=None, names=None, services=None, store_path=None):
+    """
+    Lit dans l'historique les lignes de jour dont la date est dans [start, end] (bornes incluses, None = sans borne),
+    éventuellement limitées à des employés (names, noms normalisés) ou à des services.
+    Les lignes sans date ne sont retournées que sans borne de date.
+    Quand des exports se chevauchent (même employé, nom et matricule, et même date dans plusieurs fichiers),
+    seule la ligne du fichier importé en dernier est gardée.
+    Retourne la table normalisée (mêmes colonnes que pointage_records.load_records),
+    fichier par fichier (par date de début) et dans l'ordre des lignes de chaque fichier.
+    """
+    conditions = [
+        "(r.date IS NULL OR NOT EXISTS (SELECT 1 FROM records o "
+        "WHERE o.name = r.name AND o.matricule = r.matricule AND o.date = r.date AND o.file_id > r.file_id))"
+    ]
+    params = []
+    if start is not None:
+        conditions.append("r.date >= ?")
+        params.append(pd.Timestamp(start).strftime('%Y-%m-%d'))
+    if end is not None:
+        conditions.append("r.date <= ?")
+        params.append(pd.Timestamp(end).strftime('%Y-%m-%d'))
+    for column, values in (('name', names), ('service', services)):
+        if values:
+            values = list(values)
+            conditions.append(f"r.{column} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+
+    query = (
+        f"SELECT {', '.join(f'r.{column}' for column in RECORD_COLUMNS)}, r.scans "
+        "FROM records r JOIN files f ON f.file_id = r.file_id"
+        + " WHERE " + " AND ".join(conditions)
+        + " ORDER BY f.first_date, f.source_path, r.row_order"
+    )
+    conn = connect(store_path)
+    try:
+        rows = conn.execute(query, params).fetchall()
+    finally:
+        conn.close()
+    return _records_from_rows(rows)
+
+def _records_from_rows(rows):
+    """Reconstruit la table normalisée (dates, matrice des scans int16) à partir des lignes SQLite."""
+    df = categorize(pd.DataFrame([row[:-1] for row in rows], columns=RECORD_COLUMNS))
+    for column in ['employee_seq', 'day_numeric', 'scan_count']:
+        df[column] = df[column].astype(np.int64)
+    for column in DATE_COLUMNS:
+        df[column] = pd.to_datetime(df[column], format='%Y-%m-%d').astype('datetime64[us]')
+    values = np.frombuffer(b''.join(row[-1] for row in rows), dtype='<i2')
+    return add_scan_columns(df, values)
+
+def stored_files(store_path=None):
+    """Fichiers présents dans l'historique, avec leur période et leur nombre de lignes."""
+    conn = connect(store_path)
+    try:
+        return pd.read_sql_query(
+            "SELECT source_path, first_date, last_date, row_count, datetime(imported_at, 'unixepoch', 'localtime') AS imported_at "
+            "FROM files ORDER BY first_date, source_path",
+            conn
+        )
+    finally:
+        conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Historique des pointages : import des exports et rapports sur une période.")
+    parser.add_argument('--store', default=STORE_PATH, help="Fichier SQLite de l'historique")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = subparsers.add_parser('import', help="Importer les exports d'un dossier")
+    import_parser.add_argument('input_dir', help="Dossier des exports")
+
+    subparsers.add_parser('list', help="Lister les fichiers importés")
+
+    report_parser = subparsers.add_parser('report', help="Rapport mensuel et graphique des retards sur une période")
+    report_parser.add_argument('output_dir', help="Dossier de sortie")
+    report_parser.add_argument('--start', type=date.fromisoformat, help="Premier jour (AAAA-MM-JJ)")
+    report_parser.add_argument('--end', type=date.fromisoformat, help="Dernier jour (AAAA-MM-JJ)")
+    args = parser.parse_args()
+
+    if args.command == 'import':
+        imported, unchanged = import_sources(args.input_dir, args.store)
+        print(f"{len(imported)} fichier(s) importé(s), {len(unchanged)} inchangé(s).")
+    elif args.command == 'list':
+        with pd.option_context('display.width', 200, 'display.max_rows', None):
+            print(stored_files(args.store).to_string(index=False))
+    else:
+        # Chargement à la demande : les rapports ne sont nécessaires que pour cette commande
+        from analysis_per_month import process_monthly_analysis
+        from late_arrivals_graph import generate_lateness_graph
+
+        records = query_records(args.start, args.end, store_path=args.store)
+        if records.empty:
+            print("Aucune ligne dans l'historique pour cette période.")
+            return
+        period = (args.start, args.end)
+        process_monthly_analysis(None, args.output_dir, records=records, period=period)
+        generate_lateness_graph(None, args.output_dir, records=records, period=period)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import platform
+import traceback
+import contextlib
+import importlib.util
+from datetime import date, datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BASE_DIR)
+
+from pointage_records import load_records
+from stage_profiler import StageProfiler
+
+# --- CONFIGURATION ---
+# Traitements disponibles, dans l'ordre d'exécution pour un site
+JOBS = ['daily', 'monthly', 'graph']
+
+# Fichiers écrits dans le dossier de sortie de chaque site
+LOG_FILENAME = "run.log"
+STATE_DIRNAME = ".daily_state"
+SUMMARY_FILENAME = "run_summary.json"
+
+def load_module_from_path(module_name, file_path):
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    spec = importlib.util.spec_from_file_location(module_name, file_path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+# "analysis_per_day+count.py" contient des caractères spéciaux, donc chargement dynamique nécessaire
+daily_script = load_module_from_path("daily_analysis", os.path.join(BASE_DIR, "analysis_per_day+count.py"))
+monthly_script = load_module_from_path("monthly_analysis", os.path.join(BASE_DIR, "analysis_per_month.py"))
+graph_script = load_module_from_path("lateness_graph", os.path.join(BASE_DIR, "late_arrivals_graph.py"))
+
+def expand_inputs(patterns):
+    """
+    Dossiers d'entrée désignés par les arguments (chemins ou motifs glob), dans l'ordre, sans doublon.
+    Un chemin sans motif est conservé même s'il n'existe pas (signalé en erreur dans le résumé).
+    """
+    folders, seen = [], set()
+    for pattern in patterns:
+        if glob.has_magic(pattern):
+            matches = [path for path in sorted(glob.glob(pattern)) if os.path.isdir(path)]
+        else:
+            matches = [pattern]
+        for path in matches:
+            # Un même dossier désigné par un chemin relatif et absolu n'est traité qu'une fois
+            if os.path.abspath(path) not in seen:
+                seen.add(os.path.abspath(path))
+                folders.append(os.path.normpath(path))
+    return folders
+
+def site_output_dirs(input_dirs, output_root):
+    """
+    Dossier de sortie de chaque site : chemin du dossier d'entrée relatif à la racine commune des entrées
+    (ex. Data/SITE_A/DECEMBRE et Data/SITE_B/DECEMBRE -> SITE_A/DECEMBRE et SITE_B/DECEMBRE),
+    réduit à son nom pour un seul site. Le dossier d'un site ne dépend donc pas de l'ordre des entrées,
+    et son état incrémental (STATE_DIRNAME) reste le sien d'une exécution à l'autre.
+    """
+    paths = [os.path.abspath(input_dir) for input_dir in input_dirs]
+    if not paths:
+        return []
+    root = os.path.commonpath(paths)
+    if root in paths:
+        # Un dossier d'entrée est la racine commune (un seul site, ou sites imbriqués) : son nom est gardé
+        root = os.path.dirname(root)
+    outputs = []
+    for path in paths:
+        relative = os.path.relpath(path, root)
+        outputs.append(os.path.join(output_root, "site" if relative == os.curdir else relative))
+    return outputs
+
+def job_runner(job, input_dir, output_dir, records, period):
+    """Retourne la fonction qui exécute un traitement sur la table déjà lue du site."""
+    if job == 'daily':
+        return lambda profiler: daily_script.process_daily_analysis(
+            input_dir, output_dir, records=records, incremental=daily_script.MODE_INCREMENTAL,
+            state_dir=os.path.join(output_dir, STATE_DIRNAME), profiler=profiler
+        )
+    if job == 'monthly':
+        return lambda profiler: monthly_script.process_monthly_analysis(
+            input_dir, output_dir, records=records, period=period, profiler=profiler
+        )
+    return lambda profiler: graph_script.generate_lateness_graph(
+        input_dir, output_dir, records=records, period=period, profiler=profiler
+    )
+
+def timed(func, profiler):
+    """Exécute func(profiler) : retourne (statut, résultat, erreur, durée) ; statut 'ok', 'vide' ou 'erreur'."""
+    start = time.perf_counter()
+    try:
+        result = func(profiler)
+    except Exception as e:
+        traceback.print_exc()
+        return 'erreur', None, f"{type(e).__name__}: {e}", time.perf_counter() - start
+    status = 'ok' if result is not None and not getattr(result, 'empty', False) else 'vide'
+    return status, result, None, time.perf_counter() - start
+
+def run_site(input_dir, output_dir, jobs, period=None, trace_memory=False):
+    """
+    Traite un site : lecture unique des exports de input_dir, puis chaque traitement de jobs sur la même table.
+    Les sorties console des scripts vont dans output_dir/run.log.
+    Retourne le résumé du site (statut, durées et profil de chaque étape), sérialisable en JSON.
+    """
+    summary = {'input': input_dir, 'output': output_dir, 'status': 'ok', 'records': 0, 'jobs': {}}
+    start = time.perf_counter()
+    if not os.path.isdir(input_dir):
+        summary.update(status='erreur', error=f"Dossier non trouvé : {input_dir}", wall_s=0.0)
+        return summary
+
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, LOG_FILENAME), 'w', encoding='utf-8') as log, \
+            contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        parse_profiler = StageProfiler("Lecture", trace_memory=trace_memory)
+        status, records, error, wall = timed(
+            lambda profiler: load_records(input_dir, max_workers=1, profiler=profiler), parse_profiler
+        )
+        summary['parse'] = {'status': status, 'wall_s': round(wall, 4), 'stages': parse_profiler.report()}
+        if status != 'ok':
+            summary.update(status='erreur' if error else 'vide', error=error or "Aucun export de pointage lisible.")
+            summary['wall_s'] = round(time.perf_counter() - start, 4)
+            return summary
+        summary['records'] = len(records)
+
+        for job in jobs:
+            profiler = StageProfiler(job, trace_memory=trace_memory)
+            status, output, error, wall = timed(job_runner(job, input_dir, output_dir, records, period), profiler)
+            summary['jobs'][job] = {
+                'status': status,
+                'output': output if isinstance(output, str) else None,
+                'error': error,
+                'wall_s': round(wall, 4),
+                'stages': profiler.report(),
+            }
+            if status == 'erreur':
+                summary['status'] = 'erreur'
+
+    summary['wall_s'] = round(time.perf_counter() - start, 4)
+    return summary
+
+def run_batch(input_dirs, output_root, jobs=JOBS, workers=1, period=None, trace_memory=False):
+    """
+    Traite tous les sites, en parallèle sur workers processus (un site par processus à la fois).
+    Retourne le résumé de l'exécution ; les sites y sont dans l'ordre des entrées.
+    """
+    started = datetime.now()
+    start = time.perf_counter()
+    tasks = list(zip(input_dirs, site_output_dirs(input_dirs, output_root)))
+    results = [None] * len(tasks)
+    workers = max(1, min(workers, len(tasks)))
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(run_site, input_dir, output_dir, jobs, period, trace_memory): i
+                for i, (input_dir, output_dir) in enumerate(tasks)
+            }
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    results[i] = future.result()
+                except Exception as e:
+                    input_dir, output_dir = tasks[i]
+                    results[i] = {'input': input_dir, 'output': output_dir, 'status': 'erreur',
+                                  'error': f"{type(e).__name__}: {e}", 'jobs': {}}
+                print_site(results[i])
+    else:
+        for i, (input_dir, output_dir) in enumerate(tasks):
+            results[i] = run_site(input_dir, output_dir, jobs, period, trace_memory)
+            print_site(results[i])
+
+    return {
+        'started_at': started.isoformat(timespec='seconds'),
+        'wall_s': round(time.perf_counter() - start, 4),
+        'workers': workers,
+        'jobs': list(jobs),
+        'period': [None if bound is None else bound.isoformat() for bound in period] if period else None,
+        'python': platform.python_version(),
+        'sites': results,
+        'failed': sum(1 for site in results if site['status'] == 'erreur'),
+    }
+
+def print_site(site):
+    """Une ligne de suivi par site terminé."""
+    jobs = "  ".join(f"{job}={info['status']} ({info['wall_s']:.2f} s)" for job, info in site['jobs'].items())
+    line = f"[{site['status']:<6}] {site['input']} : {site.get('records', 0)} lignes, {site.get('wall_s', 0):.2f} s  {jobs}"
+    if site.get('error'):
+        line += f"  -> {site['error']}"
+    print(line, flush=True)
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Exécution sans interface des analyses (quotidienne, mensuelle, graphique) sur plusieurs sites."
+    )
+    parser.add_argument('inputs', nargs='+', help="Dossiers d'exports ou motifs glob (ex. 'Data/*/DECEMBRE')")
+    parser.add_argument('--output', required=True, help="Dossier racine des sorties (un sous-dossier par site)")
+    parser.add_argument('--jobs', default=",".join(JOBS), help="Traitements à exécuter : daily,monthly,graph")
+    parser.add_argument('--workers', type=int, default=min(4, os.cpu_count() or 1), help="Sites traités en parallèle")
+    parser.add_argument('--start', type=date.fromisoformat,
+                        help="Premier jour des rapports mensuel et graphique (AAAA-MM-JJ)")
+    parser.add_argument('--end', type=date.fromisoformat,
+                        help="Dernier jour des rapports mensuel et graphique (AAAA-MM-JJ)")
+    parser.add_argument('--trace-memory', action='store_true', help="Mesurer le pic mémoire des étapes (plus lent)")
+    parser.add_argument('--summary', help=f"Fichier du résumé JSON (par défaut : <output>/{SUMMARY_FILENAME})")
+    args = parser.parse_args()
+
+    jobs = [job.strip() for job in args.jobs.split(',') if job.strip()]
+    unknown = [job for job in jobs if job not in JOBS]
+    if unknown:
+        parser.error(f"Traitement inconnu : {', '.join(unknown)} (choix : {', '.join(JOBS)})")
+
+    input_dirs = expand_inputs(args.inputs)
+    if not input_dirs:
+        parser.error("Aucun dossier d'entrée ne correspond aux arguments.")
+
+    period = (args.start, args.end) if args.start or args.end else None
+    summary = run_batch(input_dirs, args.output, jobs, args.workers, period, args.trace_memory)
+
+    summary_path = args.summary or os.path.join(args.output, SUMMARY_FILENAME)
+    os.makedirs(os.path.dirname(os.path.abspath(summary_path)), exist_ok=True)
+    with open(summary_path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2, default=str)
+
+    print(f"\n{len(input_dirs)} site(s) en {summary['wall_s']:.2f} s, {summary['failed']} en erreur. Résumé : {summary_path}")
+    sys.exit(1 if summary['failed'] else 0)
+
+if __name__ == "__main__":
+    main()
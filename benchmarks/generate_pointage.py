@@ -0,0 +1,160 @@
+import os
+import random
+import argparse
+from datetime import date, timedelta
+from openpyxl import Workbook
+
+# xlwt n'est nécessaire que pour produire des .xls (ancien format Excel)
+try:
+    import xlwt
+except ImportError:
+    xlwt = None
+
+# --- CONFIGURATION PAR DÉFAUT ---
+NB_EMPLOYES = 40
+NB_JOURS = 20
+DATE_DEBUT = date(2025, 11, 26)
+
+# Part des employés OUVRIER (codes HJ de pointage_records.CODES_OUVRIER sur leurs jours de semaine)
+PART_OUVRIERS = 0.2
+
+SERVICES = ['INFORMATIQUE', 'RESSOURCES HUMAINES', 'FINANCE', 'ATELIER', 'LOGISTIQUE']
+PRENOMS = ['ALI', 'HASNAA', 'YOUSSEF', 'FATIMA', 'KARIM', 'SARA', 'OMAR', 'NADIA', 'MEHDI', 'SALMA']
+NOMS = ['BENNANI', 'EL AMRANI', 'ALAOUI', 'TAZI', 'IDRISSI', 'CHERKAOUI', 'FASSI', 'BERRADA', 'SQALLI', 'LAHLOU']
+
+JOURS = ['Lu', 'Ma', 'Me', 'Je', 'Ve', 'Sa', 'Di']
+MOIS = ['JANVIER', 'FEVRIER', 'MARS', 'AVRIL', 'MAI', 'JUIN', 'JUILLET',
+        'AOUT', 'SEPTEMBRE', 'OCTOBRE', 'NOVEMBRE', 'DECEMBRE']
+
+CODES_HJ = ['100', '101', '200', '210.0']
+CODES_HJ_OUVRIER = ['130', '140', '141.0', '131']
+
+# Nombre de lignes maximal d'une feuille .xls
+XLS_MAX_ROWS = 65536
+
+def scan_string(rnd, count):
+    """Chaîne de pointages 'HH:MM HH:MM ...' : arrivée entre 07:00 et 14:59, puis sorties/entrées successives."""
+    minute = rnd.randint(7 * 60, 14 * 60 + 59)
+    scans = []
+    for _ in range(count):
+        scans.append(f"{(minute // 60) % 24:02d}:{minute % 60:02d}")
+        minute += rnd.randint(30, 300)
+    return " ".join(scans)
+
+def day_row(rnd, day, hj_code, incomplete=False):
+    """Une ligne de jour (libellé, code HJ, pointages), avec congés, jours fériés, absences et jours sans scan."""
+    label = f"{JOURS[day.weekday()]} {day.day:02d}/{day.month:02d}/{day.year}"
+    if day.weekday() == 6:
+        return (label, hj_code, None)
+
+    draw = rnd.random()
+    if draw < 0.03:
+        return (label, hj_code, "CONGE-ANNUEL")
+    if draw < 0.05:
+        return (label, hj_code, "JOUR FERIE")
+    if draw < 0.06:
+        return (label, hj_code, "ABSENCE NON JUSTIFIÉE-")
+    if draw < 0.09:
+        return (label, hj_code, "")
+
+    # Dernier jour incomplet : export fait en cours de journée, un seul scan
+    count = 1 if incomplete else rnd.choice([1, 2, 2, 3, 4, 4, 4, 4, 5, 6])
+    return (label, hj_code, scan_string(rnd, count))
+
+def generate_rows(n_employees=NB_EMPLOYES, n_days=NB_JOURS, start=DATE_DEBUT, seed=0,
+                  ouvrier_ratio=PART_OUVRIERS, incomplete_last_day=False):
+    """
+    Produit les lignes (colonnes Date, HJ, Pointages) d'un export de pointage :
+    blocs "SERVICE / SECTION :", puis par employé "NOM :", "MATRICULE :", l'en-tête et une ligne par jour.
+    Le contenu est déterministe pour une graine donnée.
+    """
+    rnd = random.Random(seed)
+    days = [start + timedelta(days=i) for i in range(n_days)]
+    per_service = max(1, -(-n_employees // len(SERVICES)))
+    rows = []
+    for emp in range(n_employees):
+        if emp % per_service == 0:
+            rows.append((f"SERVICE / SECTION : {SERVICES[emp // per_service]}", None, None))
+
+        # Espaces insécables et doubles espaces comme dans les vrais exports
+        name = f"{rnd.choice(NOMS)}\xa0 {rnd.choice(PRENOMS)} {seed}-{emp + 1}"
+        rows.append((f"NOM : {name}", None, None))
+        rows.append((f"MATRICULE : {seed * 100000 + emp + 1}", None, None))
+        rows.append(("Date", "HJ", "Pointages"))
+
+        codes = CODES_HJ_OUVRIER if rnd.random() < ouvrier_ratio else CODES_HJ
+        for i, day in enumerate(days):
+            incomplete = incomplete_last_day and i == n_days - 1
+            rows.append(day_row(rnd, day, rnd.choice(codes), incomplete))
+        rows.append(("Heures totales", None, None))
+    return rows
+
+def write_xlsx(path, rows):
+    """Écrit les lignes dans un classeur .xlsx (une feuille)."""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Pointage")
+    for row in rows:
+        ws.append(list(row))
+    wb.save(path)
+
+def write_xls(path, rows):
+    """Écrit les lignes dans un classeur .xls (nécessite xlwt)."""
+    if xlwt is None:
+        raise RuntimeError("Le format .xls nécessite le paquet xlwt (pip install xlwt).")
+    if len(rows) > XLS_MAX_ROWS:
+        raise ValueError(f"{len(rows)} lignes : au-delà de la limite .xls ({XLS_MAX_ROWS}). Utilisez .xlsx ou moins d'employés.")
+    wb = xlwt.Workbook(encoding='utf-8')
+    ws = wb.add_sheet("Pointage")
+    for i, row in enumerate(rows):
+        for j, value in enumerate(row):
+            if value is not None:
+                ws.write(i, j, value)
+    wb.save(path)
+
+def export_filename(site, end_day, extension):
+    """Nom de fichier au format des exports : le mois et l'année sont ceux du dernier jour."""
+    return f"POINTAGE SITE {site} {MOIS[end_day.month - 1]} {end_day.year}{extension}"
+
+def generate_dataset(output_dir, n_sites=2, n_employees=NB_EMPLOYES, n_days=NB_JOURS, start=DATE_DEBUT,
+                     formats=('xlsx', 'xls'), seed=0, ouvrier_ratio=PART_OUVRIERS, incomplete_last_day=False):
+    """
+    Génère n_sites exports dans output_dir, en alternant les formats demandés.
+    Retourne la liste des chemins créés.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    end_day = start + timedelta(days=n_days - 1)
+    paths = []
+    for i in range(n_sites):
+        site = chr(ord('A') + i % 26) + ('' if i < 26 else str(i // 26))
+        fmt = formats[i % len(formats)]
+        rows = generate_rows(n_employees, n_days, start, seed + i, ouvrier_ratio, incomplete_last_day)
+        path = os.path.join(output_dir, export_filename(site, end_day, f".{fmt}"))
+        if fmt == 'xls':
+            write_xls(path, rows)
+        else:
+            write_xlsx(path, rows)
+        paths.append(path)
+    return paths
+
+def main():
+    parser = argparse.ArgumentParser(description="Génère des exports de pointage synthétiques (.xlsx / .xls).")
+    parser.add_argument('output_dir', help="Dossier de sortie")
+    parser.add_argument('--sites', type=int, default=2, help="Nombre de fichiers (un par site)")
+    parser.add_argument('--employees', type=int, default=NB_EMPLOYES, help="Employés par fichier")
+    parser.add_argument('--days', type=int, default=NB_JOURS, help="Jours par employé")
+    parser.add_argument('--start', default=DATE_DEBUT.isoformat(), help="Premier jour (AAAA-MM-JJ)")
+    parser.add_argument('--formats', default='xlsx,xls', help="Formats à alterner : xlsx, xls ou xlsx,xls")
+    parser.add_argument('--seed', type=int, default=0, help="Graine aléatoire")
+    parser.add_argument('--ouvriers', type=float, default=PART_OUVRIERS, help="Part des employés OUVRIER")
+    parser.add_argument('--incomplete-last-day', action='store_true', help="Dernier jour avec un seul scan (export en cours de journée)")
+    args = parser.parse_args()
+
+    paths = generate_dataset(
+        args.output_dir, args.sites, args.employees, args.days, date.fromisoformat(args.start),
+        tuple(args.formats.split(',')), args.seed, args.ouvriers, args.incomplete_last_day
+    )
+    for path in paths:
+        print(f"Généré : {path}")
+
+if __name__ == "__main__":
+    main()
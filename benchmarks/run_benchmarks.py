@@ -0,0 +1,210 @@
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+import contextlib
+import importlib.util
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BASE_DIR)
+
+import pandas as pd
+import parse_cache
+import pointage_records
+from stage_profiler import StageProfiler
+from generate_pointage import generate_dataset
+
+# --- CONFIGURATION ---
+# Historique des mesures : une ligne JSON par exécution, pour suivre régressions et gains dans le temps
+# (fichier local, ignoré par git)
+RESULTS_FILE = os.path.join(BENCH_DIR, "results.jsonl")
+
+# Scénarios par défaut : (nom, fichiers, employés par fichier, jours)
+SCENARIOS = {
+    'small': (2, 40, 20),
+    'medium': (4, 250, 31),
+    'large': (8, 1000, 31),
+}
+
+def load_module_from_path(module_name, file_path):
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    spec = importlib.util.spec_from_file_location(module_name, file_path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+# "analysis_per_day+count.py" contient des caractères spéciaux, donc chargement dynamique nécessaire
+daily_script = load_module_from_path("daily_analysis", os.path.join(BASE_DIR, "analysis_per_day+count.py"))
+monthly_script = load_module_from_path("monthly_analysis", os.path.join(BASE_DIR, "analysis_per_month.py"))
+graph_script = load_module_from_path("lateness_graph", os.path.join(BASE_DIR, "late_arrivals_graph.py"))
+
+def git_revision():
+    """Commit courant du dépôt (None hors d'un dépôt git)."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def time_call(func, repeat):
+    """
+    Exécute func(profiler) repeat fois (sorties console masquées).
+    Retourne (durées de l'appel complet, durées de chaque étape interne mesurée par StageProfiler), en secondes.
+    """
+    durations = []
+    stages = {}
+    for _ in range(repeat):
+        profiler = StageProfiler(trace_memory=False)
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            func(profiler)
+            durations.append(time.perf_counter() - start)
+        for entry in profiler.report():
+            stages.setdefault(entry['stage'], []).append(entry['wall_s'])
+    return durations, stages
+
+def benchmark_scenario(input_dir, output_dir, repeat, workers):
+    """
+    Mesure chaque appel sur les fichiers de input_dir :
+    lecture (séquentielle, parallèle, depuis le cache), puis chaque rapport sur la table partagée
+    et chaque script complet (lecture comprise, sans cache).
+    Retourne (durées par appel, durées des étapes internes par appel, nombre de lignes).
+    """
+    calls = {}
+    calls['parse'] = time_call(
+        lambda profiler: pointage_records.load_records(input_dir, max_workers=1, use_cache=False, profiler=profiler), repeat
+    )
+    if workers > 1:
+        calls[f'parse_x{workers}'] = time_call(
+            lambda profiler: pointage_records.load_records(input_dir, max_workers=workers, use_cache=False, profiler=profiler),
+            repeat
+        )
+
+    # Premier passage pour remplir le cache, puis mesure des lectures depuis le cache
+    with contextlib.redirect_stdout(io.StringIO()):
+        records = pointage_records.load_records(input_dir, max_workers=1, use_cache=True)
+    calls['parse_cached'] = time_call(
+        lambda profiler: pointage_records.load_records(input_dir, max_workers=1, use_cache=True, profiler=profiler), repeat
+    )
+
+    calls['daily'] = time_call(
+        lambda profiler: daily_script.process_daily_analysis(input_dir, output_dir, records=records, profiler=profiler), repeat
+    )
+    calls['monthly'] = time_call(
+        lambda profiler: monthly_script.process_monthly_analysis(input_dir, output_dir, records=records, profiler=profiler), repeat
+    )
+    calls['graph'] = time_call(
+        lambda profiler: graph_script.generate_lateness_graph(input_dir, output_dir, records=records, profiler=profiler), repeat
+    )
+
+    # Scripts complets, comme en mode standalone (sans le cache de lecture)
+    pointage_records.USE_PARSE_CACHE = False
+    try:
+        calls['daily_full'] = time_call(
+            lambda profiler: daily_script.process_daily_analysis(input_dir, output_dir, profiler=profiler), repeat
+        )
+        calls['monthly_full'] = time_call(
+            lambda profiler: monthly_script.process_monthly_analysis(input_dir, output_dir, profiler=profiler), repeat
+        )
+        calls['graph_full'] = time_call(
+            lambda profiler: graph_script.generate_lateness_graph(input_dir, output_dir, profiler=profiler), repeat
+        )
+    finally:
+        pointage_records.USE_PARSE_CACHE = True
+
+    durations = {call: measures[0] for call, measures in calls.items()}
+    stages = {call: measures[1] for call, measures in calls.items()}
+    return durations, stages, len(records)
+
+def summarize(durations):
+    return {
+        'min': round(min(durations), 4),
+        'median': round(statistics.median(durations), 4),
+        'runs': len(durations),
+    }
+
+def run(scenario_names, repeat, workers, formats, results_file, keep_data=False):
+    """Exécute les scénarios, affiche un tableau et ajoute les résultats à results_file."""
+    work_dir = tempfile.mkdtemp(prefix="pointage_bench_")
+    # Cache de lecture isolé : les fichiers synthétiques ne polluent pas le cache de l'application
+    previous_cache_dir = parse_cache.CACHE_DIR
+    parse_cache.CACHE_DIR = os.path.join(work_dir, "cache")
+    try:
+        for name in scenario_names:
+            n_files, n_employees, n_days = SCENARIOS[name]
+            input_dir = os.path.join(work_dir, name, "input")
+            output_dir = os.path.join(work_dir, name, "output")
+
+            start = time.perf_counter()
+            generate_dataset(input_dir, n_files, n_employees, n_days, formats=formats)
+            generation = time.perf_counter() - start
+
+            durations, stages, n_records = benchmark_scenario(input_dir, output_dir, repeat, workers)
+            result = {
+                'timestamp': datetime.now().isoformat(timespec='seconds'),
+                'revision': git_revision(),
+                'scenario': name,
+                'files': n_files,
+                'employees_per_file': n_employees,
+                'days': n_days,
+                'formats': list(formats),
+                'records': n_records,
+                'workers': workers,
+                'generation_s': round(generation, 4),
+                # Durée de chaque appel complet, puis détail de ses étapes internes (StageProfiler)
+                'calls': {call: summarize(measures) for call, measures in durations.items()},
+                'stages': {
+                    call: {stage: summarize(measures) for stage, measures in call_stages.items()}
+                    for call, call_stages in stages.items()
+                },
+                'python': platform.python_version(),
+                'pandas': pd.__version__,
+            }
+
+            print(f"\n=== {name} : {n_files} fichiers x {n_employees} employés x {n_days} jours ({n_records} lignes) ===")
+            for call, summary in result['calls'].items():
+                print(f"{call:<28} min {summary['min']:>8.3f} s   médiane {summary['median']:>8.3f} s")
+                for stage, stage_summary in result['stages'][call].items():
+                    print(f"  {stage:<26} min {stage_summary['min']:>8.3f} s   médiane {stage_summary['median']:>8.3f} s")
+
+            with open(results_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(result, ensure_ascii=False) + "\n")
+    finally:
+        parse_cache.CACHE_DIR = previous_cache_dir
+        if keep_data:
+            print(f"\nDonnées conservées dans {work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"\nRésultats ajoutés à {results_file}")
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Mesure les trois analyses (appels complets et détail par étape) sur des exports synthétiques."
+    )
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help="Scénario à exécuter (répétable, par défaut : small)")
+    parser.add_argument('--repeat', type=int, default=3, help="Répétitions par étape")
+    parser.add_argument('--workers', type=int, default=min(4, os.cpu_count() or 1), help="Processus pour la lecture parallèle")
+    parser.add_argument('--formats', default='xlsx,xls', help="Formats des fichiers générés : xlsx, xls ou xlsx,xls")
+    parser.add_argument('--results', default=RESULTS_FILE, help="Fichier d'historique (JSON lines)")
+    parser.add_argument('--keep-data', action='store_true', help="Conserver les fichiers générés et les rapports")
+    args = parser.parse_args()
+
+    run(args.scenario or ['small'], args.repeat, args.workers, tuple(args.formats.split(',')), args.results, args.keep_data)
+
+if __name__ == "__main__":
+    main()
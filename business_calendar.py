@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+
+# --- CONFIGURATION ---
+# Jours ouvrés de la semaine, du lundi au dimanche (masque numpy) : lundi à samedi
+WEEKMASK = '1111110'
+
+# Jours fériés (dates AAAA-MM-JJ), retirés des jours ouvrés théoriques.
+# Vide par défaut : les fériés ne sont alors connus que par les lignes "JOUR FERIE" des exports.
+PUBLIC_HOLIDAYS = [
+    # "2026-01-01",
+]
+
+# Découpages acceptés par business_days_by_period : mois, semaine (lundi-dimanche)
+PERIOD_FREQUENCIES = {'mois': 'M', 'semaine': 'W'}
+
+def _days(values):
+    """Date ou colonne de dates (chaînes, datetime, Timestamp) -> datetime64[D]."""
+    return np.asarray(pd.to_datetime(values)).astype('datetime64[D]')
+
+def make_calendar(holidays=None):
+    """Calendrier numpy des jours ouvrés (WEEKMASK), sans les fériés holidays (par défaut PUBLIC_HOLIDAYS)."""
+    holidays = PUBLIC_HOLIDAYS if holidays is None else holidays
+    return np.busdaycalendar(weekmask=WEEKMASK, holidays=_days(list(holidays)))
+
+def business_days(start, end, holidays=None):
+    """
+    Nombre de jours ouvrés entre start et end, bornes incluses (0 si end < start).
+    start et end peuvent être des dates ou des colonnes de dates (un compte par élément,
+    par ex. la période de chaque employé) : le calcul est fait en une fois par numpy.
+    """
+    calendar = make_calendar(holidays)
+    counts = np.maximum(np.busday_count(_days(start), _days(end) + 1, busdaycal=calendar), 0)
+    return counts if np.ndim(counts) else int(counts)
+
+def is_public_holiday(dates, holidays=None):
+    """Masque des dates présentes dans le tableau des fériés (tout à False si le tableau est vide)."""
+    holidays = PUBLIC_HOLIDAYS if holidays is None else holidays
+    days = _days(dates)
+    if not len(holidays):
+        return np.zeros(days.shape, dtype=bool)
+    return np.isin(days, _days(list(holidays)))
+
+def business_days_by_period(start, end, freq='mois', holidays=None):
+    """
+    Jours ouvrés de [start, end] découpés par mois ou par semaine (freq, voir PERIOD_FREQUENCIES).
+    Retourne un DataFrame (period, start, end, business_days), une ligne par sous-période,
+    bornes ramenées à [start, end].
+    """
+    start, end = pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize()
+    periods = pd.period_range(start, end, freq=PERIOD_FREQUENCIES[freq])
+    starts = np.maximum(_days(periods.start_time), _days(start))
+    ends = np.minimum(_days(periods.end_time), _days(end))
+    return pd.DataFrame({
+        'period': periods.astype(str),
+        'start': starts,
+        'end': ends,
+        'business_days': business_days(starts, ends, holidays),
+    })
@@ -0,0 +1,161 @@
+import numpy as np
+import pandas as pd
+from pointage_records import clean_name_string, filter_ouvriers, scan_matrix
+from pointage_rules import (
+    first_and_last_scan, half_day_flags, lateness_flags, lunch_minutes, worked_hours
+)
+
+# Colonnes du détail journalier retourné par EmployeeIndex.query
+DETAIL_COLUMNS = [
+    'date', 'day_label', 'name', 'matricule', 'service', 'source_file', 'hj_code', 'raw_pointages',
+    'status', 'scan_count', 'first_scan', 'last_scan', 'hours_worked', 'lunch_minutes',
+    'late_930', 'late_1000', 'late_1400', 'half_day'
+]
+
+def normalize_matricule(matricule):
+    """Matricule comparable : sans espaces ni zéro décimal ajouté par Excel ('123.0' -> '123')."""
+    value = str(matricule or '').strip().upper()
+    return value[:-2] if value.endswith('.0') else value
+
+def minutes_to_hhmm(minutes):
+    """Colonne de minutes depuis minuit -> 'HH:MM' ('' si pas de scan)."""
+    return [f"{m // 60:02d}:{m % 60:02d}" if m >= 0 else "" for m in np.asarray(minutes, dtype=np.int64)]
+
+def daily_details(records, excluded=()):
+    """
+    Détail par employé-jour des lignes datées de records : statut (congé, férié, absence),
+    premier et dernier scan, heures, pause déjeuner, retards et demi-journée (règles de pointage_rules).
+    Les scans des jours de congé, fériés et d'absence sont ignorés, comme dans l'analyse mensuelle.
+    Comme dans les rapports, les employés OUVRIER (filter_ouvriers) et ceux de excluded (noms) sont retirés.
+    """
+    records = filter_ouvriers(records)
+    if len(excluded):
+        records = records[~records['name'].isin([clean_name_string(name) for name in excluded])]
+    dated = records[records['date'].notna()]
+    row_text = (dated['day_label'] + " " + dated['raw_pointages']).str.upper()
+    is_holiday = row_text.str.contains("JOUR FERIE", regex=False).to_numpy()
+    is_leave = ~is_holiday & row_text.str.contains("CONGE", regex=False).to_numpy()
+    is_absence = ~is_holiday & ~is_leave & row_text.str.contains("ABSENCE NON JUSTIFIÉE-", regex=False).to_numpy()
+    status = np.select([is_holiday, is_leave, is_absence], ['férié', 'congé', 'absence'], default='')
+
+    has_scans = ~is_holiday & ~is_leave & ~is_absence
+    counts = np.where(has_scans, dated['scan_count'].to_numpy(), 0)
+    minutes = np.where(has_scans[:, None], scan_matrix(dated), -1).astype(np.int16)
+    first, last = first_and_last_scan(minutes, counts)
+    hours = worked_hours(minutes, counts)
+    late_930, late_1000, late_1400 = lateness_flags(first, counts)
+    is_saturday = dated['day_str'].astype(str).str.startswith('Sa').to_numpy()
+    half_day = half_day_flags(first, last, hours, (hours > 0) & ~is_saturday & (counts >= 2))
+
+    return pd.DataFrame({
+        'date': dated['date'].values,
+        'day_label': dated['day_label'].values,
+        'name': dated['name'].values,
+        'matricule': dated['matricule'].values,
+        'service': dated['service'].values,
+        'source_file': dated['source_file'].values,
+        'hj_code': dated['hj_code'].values,
+        'raw_pointages': dated['raw_pointages'].values,
+        'status': status,
+        'scan_count': counts,
+        'first_scan': np.where(counts > 0, first, -1),
+        'last_scan': np.where(counts > 0, last, -1),
+        'hours_worked': hours,
+        'lunch_minutes': np.where(~is_saturday, lunch_minutes(minutes, counts), 0.0),
+        'late_930': late_930,
+        'late_1000': late_1000,
+        'late_1400': late_1400,
+        'half_day': half_day,
+    }, columns=DETAIL_COLUMNS)
+
+class EmployeeIndex:
+    """
+    Index en mémoire des lignes de jour par employé, pour les requêtes de détail.
+    Construit une seule fois à partir de la table normalisée (pointage_records.load_records
+    ou attendance_store.query_records) : le détail est calculé pour toutes les lignes,
+    trié par (nom, date), et chaque employé occupe une tranche contiguë.
+    excluded : noms retirés de l'index, en plus des employés OUVRIER (listes d'exclusion des rapports).
+    Une requête coûte une recherche dans un dictionnaire et une recherche dichotomique sur les dates.
+    """
+
+    def __init__(self, records, excluded=()):
+        details = daily_details(records, excluded)
+        order = np.lexsort((details['date'].to_numpy(), details['name'].to_numpy()))
+        self.details = details.iloc[order].reset_index(drop=True)
+        self._dates = self.details['date'].to_numpy()
+
+        # Nom normalisé -> tranche [début, fin) de self.details
+        names = self.details['name'].to_numpy()
+        bounds = np.flatnonzero(np.r_[True, names[1:] != names[:-1], True]) if len(names) else np.array([0])
+        self._by_name = {names[start]: (start, stop) for start, stop in zip(bounds[:-1], bounds[1:])}
+
+        # Matricule -> noms (un même matricule peut apparaître sous plusieurs orthographes du nom)
+        self._by_matricule = {}
+        pairs = self.details[['matricule', 'name']].drop_duplicates()
+        for matricule, name in zip(pairs['matricule'], pairs['name']):
+            key = normalize_matricule(matricule)
+            if key:
+                self._by_matricule.setdefault(key, []).append(name)
+        self._employees = None
+
+    def __len__(self):
+        return len(self.details)
+
+    def employees(self):
+        """Employés indexés : nom, matricules, services, première et dernière date, nombre de jours ; triés par nom."""
+        if self._employees is not None:
+            return self._employees
+        summary = self.details.groupby('name', sort=True, observed=True).agg(
+            matricule=('matricule', lambda values: ", ".join(sorted({v for v in values if v}))),
+            service=('service', lambda values: ", ".join(sorted({v for v in values if v}))),
+            first_date=('date', 'min'),
+            last_date=('date', 'max'),
+            days=('date', 'size'),
+        )
+        self._employees = summary.reset_index()
+        return self._employees
+
+    def _slice(self, start, stop, date_from, date_to):
+        """Tranche d'un employé réduite aux dates [date_from, date_to] par recherche dichotomique."""
+        dates = self._dates[start:stop]
+        low, high = 0, len(dates)
+        if date_from is not None:
+            low = np.searchsorted(dates, np.datetime64(pd.Timestamp(date_from)), side='left')
+        if date_to is not None:
+            high = np.searchsorted(dates, np.datetime64(pd.Timestamp(date_to)), side='right')
+        return self.details.iloc[start + low:start + max(low, high)]
+
+    def query(self, name=None, matricule=None, start=None, end=None):
+        """
+        Détail journalier d'un employé (nom, normalisé comme à l'extraction, ou matricule)
+        entre start et end (bornes incluses, None = sans borne), trié par date.
+        Retourne un DataFrame (colonnes DETAIL_COLUMNS), vide si l'employé est inconnu.
+        """
+        if name is not None:
+            names = [clean_name_string(name)]
+        elif matricule is not None:
+            names = self._by_matricule.get(normalize_matricule(matricule), [])
+        else:
+            raise ValueError("Indiquez un nom ou un matricule.")
+
+        parts = [self._slice(*self._by_name[n], start, end) for n in names if n in self._by_name]
+        if not parts:
+            return self.details.iloc[0:0]
+        if len(parts) == 1:
+            return parts[0]
+        return pd.concat(parts).sort_values('date', kind='stable')
+
+    @staticmethod
+    def summarize(details):
+        """Totaux d'un détail journalier : jours travaillés, heures, retards, demi-journées, congés, fériés, absences."""
+        return {
+            'jours travaillés': int((details['hours_worked'] > 0).sum()),
+            'heures': round(float(details['hours_worked'].sum()), 2),
+            'retards > 9h30': int(details['late_930'].sum()),
+            'retards > 10h': int(details['late_1000'].sum()),
+            'retards > 14h': int(details['late_1400'].sum()),
+            'demi-journées': int(details['half_day'].sum()),
+            'congés': int((details['status'] == 'congé').sum()),
+            'fériés': int((details['status'] == 'férié').sum()),
+            'absences': int((details['status'] == 'absence').sum()),
+        }
@@ -0,0 +1,38 @@
+import pandas as pd
+
+# MODE MÉMOIRE CONSTANTE DE XLSXWRITER : activé automatiquement au-delà de ce nombre de lignes
+CONSTANT_MEMORY_MIN_ROWS = 20000
+
+def use_constant_memory(n_rows, constant_memory=None):
+    """Résout le mode d'écriture : valeur explicite, sinon selon la taille du rapport."""
+    if constant_memory is None:
+        return n_rows >= CONSTANT_MEMORY_MIN_ROWS
+    return constant_memory
+
+def excel_writer(output, constant_memory=False):
+    """
+    Ouvre un ExcelWriter xlsxwriter.
+    En mode mémoire constante, chaque ligne est écrite sur disque dès que la suivante commence :
+    les cellules doivent alors être écrites dans l'ordre des lignes (voir write_columns).
+    """
+    engine_kwargs = {'options': {'constant_memory': True}} if constant_memory else None
+    return pd.ExcelWriter(output, engine='xlsxwriter', engine_kwargs=engine_kwargs)
+
+def write_columns(worksheet, first_row, columns, formats, constant_memory=False):
+    """
+    Écrit un tableau en une seule passe, avec un format par colonne.
+    columns : une liste de valeurs par colonne, déjà préparées ("" pour une cellule vide mise en forme).
+    Mode normal : chaque colonne est écrite en bloc (write_column).
+    Mode mémoire constante : mêmes cellules, parcourues ligne par ligne comme l'exige xlsxwriter.
+    """
+    if not constant_memory:
+        for col_idx, (values, cell_format) in enumerate(zip(columns, formats)):
+            worksheet.write_column(first_row, col_idx, values, cell_format)
+        return
+
+    n_rows = max((len(values) for values in columns), default=0)
+    for row_offset in range(n_rows):
+        row = first_row + row_offset
+        for col_idx, (values, cell_format) in enumerate(zip(columns, formats)):
+            if row_offset < len(values):
+                worksheet.write(row, col_idx, values[row_offset], cell_format)
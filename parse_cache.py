@@ -0,0 +1,133 @@
+import os
+import hashlib
+import threading
+import argparse
+import pandas as pd
+
+# --- CONFIGURATION ---
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".parse_cache")
+
+# TAILLE MAXIMALE DU CACHE SUR DISQUE (les entrées les moins récemment utilisées sont supprimées)
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+CACHE_SUFFIX = ".pkl"
+
+def cache_key(file_path, parser_version):
+    """
+    Clé du cache : empreinte SHA-256 du contenu du fichier, de son nom et de la version du parseur.
+    Le nom compte car le mois, l'année et 'source_file' en sont déduits.
+    file_path peut aussi être un fichier en mémoire (BytesIO nommé) : même clé que le fichier sur disque.
+    """
+    in_memory = not isinstance(file_path, (str, os.PathLike))
+    name = getattr(file_path, 'name', '') if in_memory else file_path
+    digest = hashlib.sha256()
+    digest.update(f"v{parser_version}\0{os.path.basename(name)}\0".encode('utf-8'))
+    if in_memory:
+        digest.update(file_path.getvalue())
+        return digest.hexdigest()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _entry_path(key, cache_dir):
+    return os.path.join(cache_dir, key + CACHE_SUFFIX)
+
+def load(key, cache_dir=None):
+    """Retourne la table mise en cache pour cette clé, ou None si absente ou illisible."""
+    cache_dir = cache_dir or CACHE_DIR
+    path = _entry_path(key, cache_dir)
+    if not os.path.exists(path):
+        return None
+    try:
+        records = pd.read_pickle(path)
+    except Exception as e:
+        print(f"Entrée de cache illisible, ignorée : {os.path.basename(path)} ({e})")
+        return None
+    # Marquer l'entrée comme récemment utilisée pour l'éviction
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+    return records
+
+def store(key, records, cache_dir=None, max_bytes=CACHE_MAX_BYTES):
+    """Enregistre la table d'un fichier dans le cache (écriture atomique) puis applique la limite de taille."""
+    cache_dir = cache_dir or CACHE_DIR
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        path = _entry_path(key, cache_dir)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        records.to_pickle(tmp_path)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"Impossible d'écrire dans le cache : {e}")
+        return
+    evict(max_bytes, cache_dir)
+
+def _entries(cache_dir):
+    if not os.path.isdir(cache_dir):
+        return []
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.endswith(CACHE_SUFFIX):
+            path = os.path.join(cache_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+    return entries
+
+def evict(max_bytes=CACHE_MAX_BYTES, cache_dir=None):
+    """Supprime les entrées les moins récemment utilisées jusqu'à repasser sous max_bytes. Retourne le nombre supprimé."""
+    cache_dir = cache_dir or CACHE_DIR
+    entries = sorted(_entries(cache_dir))
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+            removed += 1
+        except OSError:
+            continue
+    return removed
+
+def clear(cache_dir=None):
+    """Invalide tout le cache. Retourne le nombre d'entrées supprimées."""
+    cache_dir = cache_dir or CACHE_DIR
+    removed = 0
+    for _, _, path in _entries(cache_dir):
+        try:
+            os.remove(path)
+            removed += 1
+        except OSError:
+            continue
+    return removed
+
+def stats(cache_dir=None):
+    """Retourne (nombre d'entrées, taille totale en octets)."""
+    cache_dir = cache_dir or CACHE_DIR
+    entries = _entries(cache_dir)
+    return len(entries), sum(size for _, size, _ in entries)
+
+def main():
+    parser = argparse.ArgumentParser(description="Gestion du cache des fichiers de pointage analysés.")
+    parser.add_argument('--clear', action='store_true', help="Supprimer toutes les entrées du cache")
+    parser.add_argument('--max-mb', type=int, help="Réduire le cache à cette taille (Mo)")
+    parser.add_argument('--dir', default=CACHE_DIR, help="Dossier du cache")
+    args = parser.parse_args()
+
+    if args.clear:
+        print(f"Cache vidé : {clear(args.dir)} entrée(s) supprimée(s).")
+    elif args.max_mb is not None:
+        print(f"Éviction : {evict(args.max_mb * 1024 * 1024, args.dir)} entrée(s) supprimée(s).")
+
+    count, size = stats(args.dir)
+    print(f"Cache : {count} entrée(s), {size / (1024 * 1024):.1f} Mo dans {args.dir}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,636 @@
+import pandas as pd
+import numpy as np
+import io
+import os
+import re
+import time
+import warnings
+import functools
+import multiprocessing
+from array import array
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from openpyxl import load_workbook
+import xlrd
+import parse_cache
+from stage_profiler import profiled
+
+# Supprimer les avertissements de openpyxl si il lit des fichiers mal nommés
+warnings.filterwarnings('ignore', category=UserWarning, module='openpyxl')
+
+# CODES QUI SIGNIFIENT UN "OUVRIER"
+CODES_OUVRIER = ['130', '140', '141', '131']
+
+# NOMBRE DE PROCESSUS POUR LA LECTURE DES FICHIERS (1 = lecture séquentielle)
+EXTRACTION_WORKERS = 1
+
+# CACHE DES FICHIERS ANALYSÉS (voir parse_cache.py)
+USE_PARSE_CACHE = True
+
+# Démarrage des processus de lecture : 'forkserver' plutôt que 'fork', qui peut bloquer quand le processus
+# parent a déjà des threads (serveur Streamlit, pré-chargement, pool des étapes) ; 'spawn' si indisponible
+POOL_START_METHOD = 'forkserver'
+
+# Version du parseur : à incrémenter à chaque changement du format de la table, pour invalider le cache
+PARSER_VERSION = 2
+
+# Préfixes des jours de la semaine dans les exports de pointage
+DAYS_FRENCH = ['Lu', 'Ma', 'Me', 'Je', 'Ve', 'Sa', 'Di']
+
+# Colonnes de la table normalisée des enregistrements employé-jour
+RECORD_COLUMNS = [
+    'source_file', 'employee_seq', 'service', 'name', 'matricule',
+    'day_label', 'day_str', 'day_numeric', 'date', 'full_date',
+    'hj_code', 'raw_pointages', 'scan_count', 'month_num', 'year_num'
+]
+
+# Colonnes répétées d'une ligne à l'autre (fichier, employé, jour, codes) : stockées en catégories,
+# chaque valeur distincte n'est gardée qu'une fois et les regroupements se font sur des codes entiers
+CATEGORY_COLUMNS = ['source_file', 'service', 'name', 'matricule', 'day_str', 'hj_code', 'month_num', 'year_num']
+
+# Colonnes de la matrice des scans : scan_1, scan_2, ... en minutes depuis minuit (int16, -1 = pas de scan)
+SCAN_COLUMN_PREFIX = 'scan_'
+
+# Lignes de jour par lot lors de la lecture en flux d'un export (voir iter_record_batches)
+RECORD_BATCH_ROWS = 20000
+
+# Colonnes lues dans les exports : libellé (jour ou bloc employé), code HJ, pointages
+READ_COLUMNS = 3
+
+# Signatures des classeurs : archive zip (.xlsx, Office Open XML) et conteneur OLE2 (.xls, BIFF)
+XLSX_SIGNATURE = b'PK\x03\x04'
+XLS_SIGNATURE = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+
+# Format attendu selon l'extension, quand la signature n'est pas reconnue
+EXTENSION_FORMATS = {'.xlsx': 'xlsx', '.xlsm': 'xlsx', '.xls': 'xls'}
+
+# Expression d'un scan HH:MM dans la cellule de pointages
+SCAN_TIME_PATTERN = re.compile(r'\d{1,2}:\d{2}')
+
+# --- CLASSIFICATION DES LIGNES ---
+# Types de ligne reconnus par classify_row
+ROW_OTHER, ROW_SECTION, ROW_NAME, ROW_MATRICULE, ROW_DAY = range(5)
+
+# Marqueurs des lignes d'en-tête d'un bloc employé (cherchés n'importe où dans la cellule)
+SECTION_MARKER = 'SERVICE / SECTION :'
+NAME_MARKER = 'NOM :'
+MATRICULE_MARKER = 'MATRICULE :'
+EMPLOYEE_MARKER_PATTERN = re.compile('|'.join(re.escape(m) for m in (SECTION_MARKER, NAME_MARKER, MATRICULE_MARKER)))
+
+# Ligne de jour : préfixe de jour puis premier nombre (numéro du jour)
+_DAY_PREFIX = '(?:' + '|'.join(re.escape(day) for day in DAYS_FRENCH) + ')'
+DAY_ROW_PATTERN = re.compile(_DAY_PREFIX + r'\D*(\d+)')
+# Forme standard "Lu 01/12/2025" : jour, mois et année capturés dans la même correspondance
+DAY_DATE_ROW_PATTERN = re.compile(_DAY_PREFIX + r'\D*(\d{2})/(\d{2})/(\d{4})')
+
+@functools.lru_cache(maxsize=65536)
+def clean_name_string(name):
+    """Normalise les noms pour assurer la correspondance malgré les espaces/caractères cachés."""
+    if not name:
+        return ""
+    name = str(name).upper()
+    name = name.replace('\xa0', ' ').replace('\t', ' ').replace('\n', ' ')
+    name = re.sub(r'\s+', ' ', name)
+    return name.strip()
+
+def named_buffer(data=b'', name=''):
+    """Fichier en mémoire (BytesIO) portant un nom de fichier, comme un fichier téléversé."""
+    buffer = io.BytesIO(data)
+    buffer.name = name
+    return buffer
+
+def is_path(source):
+    """Indique si une entrée est un chemin sur disque (sinon : fichier en mémoire)."""
+    return isinstance(source, (str, os.PathLike))
+
+def source_name(source):
+    """Nom de fichier d'une entrée : chemin sur disque ou fichier en mémoire (UploadedFile, BytesIO nommé)."""
+    if is_path(source):
+        return os.path.basename(source)
+    return os.path.basename(getattr(source, 'name', '') or '')
+
+def source_bytes(source):
+    """Contenu complet d'un fichier en mémoire, sans déplacer sa position de lecture."""
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source)
+    return source.getvalue()
+
+def report_target(output_dir, filename):
+    """
+    Destination d'un rapport : chemin dans output_dir,
+    ou fichier en mémoire nommé filename si output_dir est None.
+    """
+    if output_dir is None:
+        return named_buffer(name=filename)
+    return os.path.join(output_dir, filename)
+
+def detect_format(file_path):
+    """
+    Format réel d'un classeur d'après sa signature (premiers octets) : 'xlsx' ou 'xls'.
+    file_path est un chemin ou un fichier en mémoire, dont la position de lecture est conservée.
+    Signature inconnue : format attendu selon l'extension (None si l'extension n'est pas gérée).
+    """
+    if is_path(file_path):
+        with open(file_path, 'rb') as f:
+            header = f.read(len(XLS_SIGNATURE))
+    else:
+        position = file_path.tell()
+        file_path.seek(0)
+        header = file_path.read(len(XLS_SIGNATURE))
+        file_path.seek(position)
+
+    if header.startswith(XLSX_SIGNATURE):
+        return 'xlsx'
+    if header.startswith(XLS_SIGNATURE):
+        return 'xls'
+    return EXTENSION_FORMATS.get(os.path.splitext(source_name(file_path))[1].lower())
+
+def get_sheet_rows(file_path, timings=None):
+    """
+    Générateur qui produit les lignes de fichiers .xlsx ou .xls sous forme de valeurs brutes.
+    file_path est un chemin ou un fichier en mémoire (voir source_name).
+    Le moteur est choisi d'après la signature du fichier (voir detect_format), pas d'après son extension :
+    un .xlsx nommé .xls est lu directement avec openpyxl.
+    Les .xlsx sont lus en streaming (mode lecture seule) : la mémoire reste bornée quelle que soit la taille du fichier.
+    Seules les READ_COLUMNS premières colonnes sont lues ; les .xls sont extraits en bloc, colonne par colonne.
+    Si timings (dict, voir new_timings) est fourni, le format détecté y est compté.
+    """
+    file_name = source_name(file_path)
+    ext = os.path.splitext(file_name)[1].lower()
+    if not is_path(file_path):
+        file_path = named_buffer(source_bytes(file_path), file_name)
+
+    file_format = detect_format(file_path)
+    if timings is not None:
+        timings['formats'][file_format or 'inconnu'] += 1
+    if file_format is None:
+        return
+    if EXTENSION_FORMATS.get(ext) != file_format:
+        print(f"Attention : '{file_name}' est un fichier .{file_format} nommé comme {ext or 'sans extension'}.")
+        if timings is not None:
+            timings['misnamed'] += 1
+
+    if file_format == 'xlsx':
+        if is_path(file_path) and ext not in ('.xlsx', '.xlsm'):
+            # openpyxl refuse les autres extensions sur un chemin : lui passer le fichier ouvert
+            with open(file_path, 'rb') as f:
+                yield from _openpyxl_rows(f)
+        else:
+            yield from _openpyxl_rows(file_path)
+        return
+
+    try:
+        # on_demand : seule la première feuille est chargée
+        if is_path(file_path):
+            workbook = xlrd.open_workbook(file_path, on_demand=True)
+        else:
+            workbook = xlrd.open_workbook(file_contents=file_path.getvalue(), on_demand=True)
+        try:
+            sheet = workbook.sheet_by_index(0)
+            columns = [sheet.col_values(col) for col in range(min(READ_COLUMNS, sheet.ncols))]
+        finally:
+            workbook.release_resources()
+    except Exception as e:
+        print(f"Erreur lors du traitement du fichier .xls {file_name} : {e}")
+        return
+    yield from zip(*columns)
+
+def _openpyxl_rows(source):
+    """Lignes (READ_COLUMNS premières colonnes) de la feuille active d'un .xlsx, en lecture seule."""
+    wb = load_workbook(source, read_only=True, data_only=True)
+    try:
+        sheet = wb.active
+        # Les exports déclarent parfois des dimensions fausses : lire toutes les lignes présentes
+        sheet.reset_dimensions()
+        for row in sheet.iter_rows(max_col=READ_COLUMNS, values_only=True):
+            yield row
+    finally:
+        wb.close()
+
+def extract_month_year_from_filename(file_path):
+    """Extrait le mois et l'année du nom de fichier."""
+    filename = source_name(file_path).upper()
+
+    # Chercher les mois en français dans le nom de fichier
+    months = {
+        'JANVIER': '01', 'FEVRIER': '02', 'MARS': '03', 'AVRIL': '04',
+        'MAI': '05', 'JUIN': '06', 'JUILLET': '07', 'AOUT': '08',
+        'SEPTEMBRE': '09', 'OCTOBRE': '10', 'NOVEMBRE': '11', 'DECEMBRE': '12'
+    }
+
+    # Chercher l'année (4 chiffres)
+    year_match = re.search(r'\b(20\d{2})\b', filename)
+    year = year_match.group(1) if year_match else '2025'
+
+    # Chercher le mois
+    for month_name, month_num in months.items():
+        if month_name in filename:
+            return month_num, year
+
+    # Si aucun mois trouvé, essayer de chercher des nombres de 1-12
+    month_match = re.search(r'\b(0[1-9]|1[0-2])\b', filename)
+    if month_match:
+        return month_match.group(1), year
+
+    # Valeur par défaut
+    return '12', year
+
+def parse_day_dates(val_0):
+    """
+    Extrait les dates d'une ligne de jour.
+    Retourne (date, full_date) : 'date' accepte J/M/AAAA, 'full_date' exige JJ/MM/AAAA.
+    """
+    date = None
+    date_match = re.search(r'(\d{1,2})[/](\d{1,2})[/](\d{4})', val_0)
+    if date_match:
+        try:
+            d, m, y = map(int, date_match.groups())
+            date = datetime(y, m, d)
+        except:
+            pass
+
+    full_date = None
+    match = re.search(r'(\d{2})/(\d{2})/(\d{4})', val_0)
+    if match:
+        try:
+            full_date = datetime(int(match.group(3)), int(match.group(2)), int(match.group(1)))
+        except:
+            pass
+
+    return date, full_date
+
+def classify_row(val_0):
+    """
+    Classe une ligne d'après sa première cellule (déjà nettoyée).
+    Retourne (type, champs) : type parmi ROW_SECTION, ROW_NAME, ROW_MATRICULE, ROW_DAY, ROW_OTHER ;
+    champs vaut (numéro du jour, date, full_date) pour une ligne de jour, None sinon.
+    Les marqueurs d'en-tête sont prioritaires sur les lignes de jour, dans l'ordre section, nom, matricule.
+    """
+    if not val_0:
+        return ROW_OTHER, None
+
+    if EMPLOYEE_MARKER_PATTERN.search(val_0):
+        if SECTION_MARKER in val_0:
+            return ROW_SECTION, None
+        if NAME_MARKER in val_0:
+            return ROW_NAME, None
+        return ROW_MATRICULE, None
+
+    # Cas courant : une seule correspondance donne le numéro du jour et la date
+    match = DAY_DATE_ROW_PATTERN.match(val_0)
+    if match:
+        d, m, y = match.groups()
+        try:
+            date = datetime(int(y), int(m), int(d))
+        except ValueError:
+            date = None
+        return ROW_DAY, (int(d), date, date)
+
+    # Autres libellés de jour (date J/M/AAAA, absente ou décalée) : extraction détaillée
+    match = DAY_ROW_PATTERN.match(val_0)
+    if match:
+        date, full_date = parse_day_dates(val_0)
+        return ROW_DAY, (int(match.group(1)), date, full_date)
+
+    return ROW_OTHER, None
+
+def is_input_file(file):
+    """Indique si un fichier du dossier d'entrée est un export de pointage à analyser."""
+    return (
+        file.lower().endswith(('.xls', '.xlsx'))
+        and not file.startswith("Daily_Analysis")
+        and not file.startswith("Monthly")
+        and not file.startswith("Master")
+        and not file.startswith("~$")
+    )
+
+def timed_rows(rows, timings):
+    """Itère sur rows en cumulant dans timings le temps passé à lire le classeur ('read_wall', 'read_cpu')."""
+    while True:
+        start_wall = time.perf_counter()
+        start_cpu = time.thread_time()
+        try:
+            row = next(rows)
+        except StopIteration:
+            return
+        finally:
+            timings['read_wall'] += time.perf_counter() - start_wall
+            timings['read_cpu'] += time.thread_time() - start_cpu
+        yield row
+
+def iter_record_batches(file_path, timings=None, batch_rows=None):
+    """
+    Lit un export de pointage une seule fois et produit ses lignes de jour par lots,
+    rattachées à leur employé (service, nom, matricule) : chaque lot est une table normalisée
+    (voir records_frame) d'environ batch_rows lignes (RECORD_BATCH_ROWS par défaut).
+    Un lot est clos au début d'un nouvel employé : les lignes d'un employé ne sont jamais réparties
+    sur deux lots, un lot peut donc être traité seul (filtre OUVRIER compris, voir filter_ouvriers).
+    Les lignes circulent du lecteur vers un tampon de tuples borné par la taille du lot :
+    la mémoire de lecture ne dépend pas de la taille du fichier.
+    Aucun filtrage n'est appliqué ici : chaque rapport sélectionne ses lignes.
+    Les scans sont convertis une seule fois en minutes depuis minuit.
+    Si timings (dict) est fourni, le temps de lecture du classeur y est cumulé (voir timed_rows).
+    """
+    batch_rows = batch_rows or RECORD_BATCH_ROWS
+    buffer = []
+    scan_values = array('h')
+    service = ''
+    name = ''
+    matricule = ''
+    employee_seq = 0
+    source_file_name = source_name(file_path)
+    month_num, year_num = extract_month_year_from_filename(file_path)
+
+    rows = get_sheet_rows(file_path, timings)
+    if timings is not None:
+        rows = timed_rows(rows, timings)
+
+    for row in rows:
+        if not row: continue
+
+        val_0 = str(row[0]).strip() if row[0] else ''
+
+        kind, day_fields = classify_row(val_0)
+
+        # Nouveau bloc employé : le lot en cours est clos s'il est plein
+        if (kind == ROW_SECTION or kind == ROW_NAME) and len(buffer) >= batch_rows:
+            yield records_frame(buffer, scan_values)
+            buffer = []
+            scan_values = array('h')
+
+        # --- NOUVELLE SECTION OU NOM : NOUVEAU BLOC EMPLOYÉ ---
+        if kind == ROW_SECTION:
+            employee_seq += 1
+            service = val_0.replace(SECTION_MARKER, '').strip()
+            name = ''
+            matricule = ''
+
+        elif kind == ROW_NAME:
+            employee_seq += 1
+            name = clean_name_string(val_0.replace(NAME_MARKER, '').strip())
+            matricule = ''
+
+        elif kind == ROW_MATRICULE:
+            matricule = val_0.replace(MATRICULE_MARKER, '').strip()
+
+        # --- LIGNES QUOTIDIENNES ---
+        elif kind == ROW_DAY:
+            hj_val = row[1] if len(row) > 1 else ''
+            raw_scan_val = row[2] if len(row) > 2 else ''
+            raw_pointages = str(raw_scan_val) if raw_scan_val else ''
+            scan_minutes = [int(t[:-3]) * 60 + int(t[-2:]) for t in SCAN_TIME_PATTERN.findall(raw_pointages)]
+            scan_values.extend(scan_minutes)
+            day_numeric, date, full_date = day_fields
+
+            # Une ligne = un tuple dans l'ordre de RECORD_COLUMNS
+            buffer.append((
+                source_file_name, employee_seq, service, name, matricule,
+                val_0, val_0.split(None, 1)[0], day_numeric, date, full_date,
+                str(hj_val).strip(), raw_pointages, len(scan_minutes), month_num, year_num
+            ))
+
+    if buffer:
+        yield records_frame(buffer, scan_values)
+
+def scan_columns(records):
+    """Retourne les noms des colonnes de la matrice des scans (scan_1, scan_2, ...)."""
+    return [
+        col for col in records.columns
+        if col.startswith(SCAN_COLUMN_PREFIX) and col[len(SCAN_COLUMN_PREFIX):].isdigit()
+    ]
+
+def scan_matrix(records):
+    """Retourne la matrice (lignes x scans) des minutes depuis minuit, -1 au-delà de scan_count."""
+    return records[scan_columns(records)].to_numpy()
+
+def records_frame(rows=(), scan_values=()):
+    """
+    Construit la table normalisée à partir de lignes extraites (tuples dans l'ordre de RECORD_COLUMNS)
+    et des minutes de leurs scans mises bout à bout.
+    Les scans deviennent une matrice int16 complétée par -1 (colonnes scan_1..scan_N),
+    alignée sur scan_count ; aucune chaîne 'HH:MM' n'est relue en aval.
+    """
+    df = categorize(pd.DataFrame(rows, columns=RECORD_COLUMNS))
+    return add_scan_columns(df, np.asarray(scan_values, dtype=np.int16))
+
+def categorize(df):
+    """Convertit en catégories les colonnes de CATEGORY_COLUMNS présentes dans df (sur place) et retourne df."""
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    return df
+
+def add_scan_columns(df, values):
+    """
+    Ajoute à df la matrice des scans (colonnes scan_1..scan_N, int16, -1 au-delà de scan_count).
+    values : les minutes de toutes les lignes mises bout à bout, dans l'ordre des lignes.
+    """
+    counts = df['scan_count'].to_numpy(dtype=np.int64)
+    width = max(1, int(counts.max())) if len(counts) else 1
+    matrix = np.full((len(counts), width), -1, dtype=np.int16)
+
+    if len(values):
+        rows = np.repeat(np.arange(len(counts)), counts)
+        cols = np.arange(len(values)) - np.repeat(np.cumsum(counts) - counts, counts)
+        matrix[rows, cols] = values
+
+    for i in range(width):
+        df[f'{SCAN_COLUMN_PREFIX}{i + 1}'] = matrix[:, i]
+    return df
+
+def records_in_period(records, period, column='full_date'):
+    """
+    Lignes de records dont la date (colonne column) est dans period = (début, fin), bornes incluses.
+    Une borne None n'est pas appliquée ; period=None retourne records inchangé.
+    """
+    if period is None:
+        return records
+    start, end = period
+    mask = records[column].notna()
+    if start is not None:
+        mask &= records[column] >= pd.Timestamp(start)
+    if end is not None:
+        mask &= records[column] <= pd.Timestamp(end)
+    return records[mask]
+
+def load_file_records(file_path, use_cache=None, timings=None):
+    """
+    Retourne la table normalisée d'un seul fichier (chemin ou fichier en mémoire).
+    Si le cache est actif, un fichier au contenu inchangé n'est pas relu.
+    Si timings (dict, voir new_timings) est fourni, le temps de lecture et les accès au cache y sont comptés.
+    """
+    if use_cache is None:
+        use_cache = USE_PARSE_CACHE
+
+    key = None
+    if use_cache:
+        try:
+            key = parse_cache.cache_key(file_path, PARSER_VERSION)
+        except OSError as e:
+            print(f"Cache ignoré pour {source_name(file_path)} : {e}")
+        else:
+            cached = parse_cache.load(key)
+            if cached is not None:
+                if timings is not None:
+                    timings['cache_hits'] += 1
+                return cached
+
+    try:
+        records = concat_records(list(iter_record_batches(file_path, timings)))
+    except Exception as e:
+        # Un fichier illisible ne contribue aucune ligne (pas de lots partiels)
+        print(f"Erreur lors de l'ouverture du fichier {source_name(file_path)} : {e}")
+        records = records_frame()
+    if key is not None and not records.empty:
+        parse_cache.store(key, records)
+    return records
+
+def new_timings():
+    """Compteurs remplis par load_file_records : durées, accès au cache, formats détectés et fichiers mal nommés."""
+    return {
+        'read_wall': 0.0, 'read_cpu': 0.0, 'parse_wall': 0.0, 'parse_cpu': 0.0,
+        'cache_hits': 0, 'formats': Counter(), 'misnamed': 0
+    }
+
+def load_file_records_timed(file_path, use_cache=None):
+    """
+    load_file_records avec mesure des durées : retourne (table, timings). Utilisable dans un pool de processus.
+    Le temps hors lecture du classeur est compté comme analyse des lignes ; un fichier repris du cache compte en lecture.
+    """
+    timings = new_timings()
+    start_wall = time.perf_counter()
+    start_cpu = time.thread_time()
+    records = load_file_records(file_path, use_cache, timings)
+    wall = time.perf_counter() - start_wall
+    cpu = time.thread_time() - start_cpu
+    if timings['cache_hits']:
+        timings['read_wall'], timings['read_cpu'] = wall, cpu
+    else:
+        timings['parse_wall'], timings['parse_cpu'] = wall - timings['read_wall'], cpu - timings['read_cpu']
+    return records, timings
+
+def concat_records(frames):
+    """
+    Assemble les tables de plusieurs fichiers dans l'ordre donné.
+    Les matrices de scans de largeurs différentes sont complétées par -1.
+    """
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return records_frame()
+    if len(frames) == 1:
+        return frames[0]
+
+    df = pd.concat(frames, ignore_index=True)
+    # Catégories différentes d'un fichier à l'autre : pandas revient aux chaînes, on recatégorise
+    categorize(df)
+    for col in scan_columns(df):
+        df[col] = df[col].fillna(-1).astype(np.int16)
+    for col in ['date', 'full_date']:
+        df[col] = pd.to_datetime(df[col])
+    return df
+
+def input_sources(input_dir):
+    """
+    Liste les exports à analyser, sous forme de (nom, source).
+    input_dir est un dossier, ou une liste de fichiers en mémoire (fichiers téléversés, BytesIO nommés)
+    dont le contenu est copié dans des BytesIO transmissibles aux processus de lecture.
+    """
+    if is_path(input_dir):
+        return [(file, os.path.join(input_dir, file)) for file in os.listdir(input_dir)]
+    return [(source_name(f), named_buffer(source_bytes(f), source_name(f))) for f in input_dir]
+
+def inputs_exist(input_dir):
+    """Vérifie qu'un dossier d'entrée existe (toujours vrai pour une liste de fichiers en mémoire)."""
+    return not is_path(input_dir) or os.path.exists(input_dir)
+
+@profiled
+def load_records(input_dir, max_workers=None, use_cache=None, profiler=None):
+    """
+    Analyse une seule fois tous les exports de input_dir (dossier ou liste de fichiers en mémoire).
+    Avec max_workers > 1, les fichiers sont lus en parallèle dans un pool de processus ;
+    les résultats sont fusionnés dans l'ordre d'entrée (os.listdir pour un dossier), comme en lecture séquentielle.
+    Les fichiers déjà analysés sont relus depuis le cache (voir USE_PARSE_CACHE).
+    Avec un profiler (stage_profiler.StageProfiler), les étapes 'lecture des fichiers' et 'analyse des lignes'
+    sont mesurées (durées cumulées sur les processus de lecture), avec les formats détectés (voir detect_format).
+    Retourne la table normalisée (DataFrame) partagée par les trois rapports.
+    """
+    if max_workers is None:
+        max_workers = EXTRACTION_WORKERS
+
+    profiler.begin('lecture des fichiers')
+    paths = []
+    print("Analyse des fichiers...")
+    for file, source in input_sources(input_dir):
+        if is_input_file(file):
+            print(f"Lecture : {file}...")
+            paths.append(source)
+
+    workers = min(max_workers, len(paths)) if max_workers > 1 and len(paths) > 1 else 1
+    loader = load_file_records_timed if profiler.enabled else load_file_records
+    if workers > 1:
+        with reading_pool(workers) as pool:
+            # map() conserve l'ordre des fichiers : fusion déterministe
+            results = list(pool.map(loader, paths, [use_cache] * len(paths)))
+    else:
+        results = [loader(path, use_cache) for path in paths]
+
+    if not profiler.enabled:
+        return concat_records(results)
+
+    timings = new_timings()
+    frames = []
+    for frame, file_timings in results:
+        frames.append(frame)
+        for key in timings:
+            timings[key] += file_timings[key]
+    records = concat_records(frames)
+    formats = {f'format_{file_format}': count for file_format, count in sorted(timings['formats'].items())}
+    if timings['misnamed']:
+        formats['mal_nommés'] = timings['misnamed']
+    profiler.end(
+        wall=timings['read_wall'], cpu=timings['read_cpu'],
+        fichiers=len(paths), cache=timings['cache_hits'], processus=workers, **formats
+    )
+    profiler.record('analyse des lignes', timings['parse_wall'], timings['parse_cpu'], lignes=len(records))
+    return records
+
+def reading_pool(max_workers):
+    """Pool de processus de lecture, démarré selon POOL_START_METHOD (ce module est préchargé par le serveur)."""
+    method = POOL_START_METHOD if POOL_START_METHOD in multiprocessing.get_all_start_methods() else 'spawn'
+    context = multiprocessing.get_context(method)
+    if method == 'forkserver':
+        context.set_forkserver_preload([__name__])
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=context)
+
+def drop_conge_rows(records):
+    """Retire les lignes de congé ("CONGE-") et les lignes d'en-tête ('Date', 'Heures') ignorées par les rapports quotidiens."""
+    row_text = (records['day_label'] + " " + records['raw_pointages']).str.upper()
+    mask = (
+        ~row_text.str.contains("CONGE-", regex=False)
+        & ~records['day_label'].str.contains('Date', regex=False)
+        & ~records['day_label'].str.contains('Heures', regex=False)
+    )
+    return records[mask]
+
+def filter_ouvriers(records):
+    """
+    Décide pour chaque bloc employé s'il s'agit d'un OUVRIER basé sur les codes HJ.
+    Un bloc est exclu si strictement plus de 50% de ses jours de semaine (hors Sam/Dim)
+    portent un code de CODES_OUVRIER.
+    """
+    if records.empty:
+        return records
+
+    # Colonnes catégorielles : les tests sur les chaînes portent sur les valeurs distinctes
+    is_weekday = ~records['day_str'].astype('category').str.startswith(('Sa', 'Di'))
+    hj = records['hj_code'].astype('category')
+    hj_codes = hj.cat.categories
+    ouvrier_codes = hj_codes[hj_codes.astype(str).str.split('.').str[0].str.strip().isin(CODES_OUVRIER)]
+    is_ouvrier_day = is_weekday & hj.isin(ouvrier_codes)
+
+    block_keys = [records['source_file'], records['employee_seq']]
+    weekday_count = is_weekday.groupby(block_keys, observed=True).transform('sum')
+    ouvrier_count = is_ouvrier_day.groupby(block_keys, observed=True).transform('sum')
+
+    return records[~(2 * ouvrier_count > weekday_count)]
@@ -0,0 +1,59 @@
+import numpy as np
+
+# Les fonctions travaillent sur la matrice des scans de pointage_records :
+# minutes depuis minuit (int16), une ligne par employé-jour, -1 au-delà de scan_count.
+
+# --- SEUILS HORAIRES (minutes depuis minuit) ---
+LIMITE_0930 = 9 * 60 + 30
+LIMITE_1000 = 10 * 60
+LIMITE_1300 = 13 * 60
+LIMITE_1400 = 14 * 60
+MINUTES_PAR_JOUR = 24 * 60
+
+def first_and_last_scan(minutes, counts):
+    """Retourne le premier et le dernier scan de chaque ligne (-1 si aucun scan)."""
+    first = minutes[:, 0]
+    last = minutes[np.arange(len(counts)), np.maximum(counts - 1, 0)]
+    return first, last
+
+def worked_hours(minutes, counts):
+    """
+    Calcule les heures travaillées par paires de scans (entrée, sortie).
+    Une sortie antérieure à l'entrée est comptée le lendemain (quart de nuit).
+    """
+    total_minutes = np.zeros(len(counts), dtype=np.int64)
+    for i in range(0, minutes.shape[1] - 1, 2):
+        diff = minutes[:, i + 1].astype(np.int64) - minutes[:, i]
+        diff = np.where(diff < 0, diff + MINUTES_PAR_JOUR, diff)
+        total_minutes += np.where(counts > i + 1, diff, 0)
+    return np.round(total_minutes * 60 / 3600, 2)
+
+def lunch_minutes(minutes, counts):
+    """Durée de la pause déjeuner (écart entre le scan 2 et le scan 3) pour les lignes d'au moins 4 scans, sinon 0."""
+    if minutes.shape[1] < 4:
+        return np.zeros(len(counts))
+    gap = minutes[:, 2].astype(np.int64) - minutes[:, 1]
+    gap = np.where(gap < 0, gap + MINUTES_PAR_JOUR, gap)
+    return np.where(counts >= 4, gap, 0).astype(float)
+
+def lateness_flags(first, counts):
+    """
+    Retards hiérarchisés sur le premier scan (strictement après le seuil) :
+    14:00 prend le dessus sur 10:00, qui prend le dessus sur 09:30.
+    Retourne (late_930, late_1000, late_1400).
+    """
+    has_scan = counts > 0
+    late_1400 = has_scan & (first > LIMITE_1400)
+    late_1000 = has_scan & ~late_1400 & (first > LIMITE_1000)
+    late_930 = has_scan & ~late_1400 & ~late_1000 & (first > LIMITE_0930)
+    return late_930, late_1000, late_1400
+
+def half_day_flags(first, last, hours, eligible):
+    """
+    Demi-journée pour les lignes éligibles :
+    entrée >= 13:00 (après-midi seulement) OU (sortie <= 14:00 ET heures < 7) (matin seulement).
+    """
+    last_adjusted = np.where(last < first, last + MINUTES_PAR_JOUR, last)
+    cond_afternoon = first >= LIMITE_1300
+    cond_morning = (last_adjusted <= LIMITE_1400) & (hours < 7.0)
+    return eligible & (cond_afternoon | cond_morning)
@@ -0,0 +1,152 @@
+import time
+import functools
+import threading
+import tracemalloc
+
+# Le suivi mémoire (tracemalloc) est global au processus : il reste actif tant qu'un profiler mesure une étape
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+
+def _start_tracing():
+    global _tracing_users
+    with _tracing_lock:
+        if _tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        _tracing_users += 1
+
+def _stop_tracing():
+    global _tracing_users
+    with _tracing_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0 and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+class StageProfiler:
+    """
+    Mesure par étape d'un traitement : durée réelle, temps CPU du thread et pic mémoire (tracemalloc).
+    Les étapes s'enchaînent : begin() clôt l'étape en cours et ouvre la suivante, end() clôt la dernière.
+    Le pic mémoire est celui du processus au-dessus du niveau d'entrée de l'étape :
+    approximatif quand plusieurs traitements tournent en parallèle dans le même processus.
+    Un profiler désactivé (enabled=False) ne mesure rien.
+    """
+
+    def __init__(self, name='', enabled=True, trace_memory=True):
+        self.name = name
+        self.enabled = enabled
+        self.trace_memory = trace_memory
+        self.entries = []
+        self._current = None
+
+    def begin(self, stage, **details):
+        """Ouvre une étape (et clôt la précédente). details : informations affichées avec l'étape."""
+        if not self.enabled:
+            return
+        self.end()
+        baseline = 0
+        if self.trace_memory:
+            _start_tracing()
+            baseline = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        self._current = (stage, details, time.perf_counter(), time.thread_time(), baseline)
+
+    def end(self, wall=None, cpu=None, **details):
+        """
+        Clôt l'étape en cours (sans effet s'il n'y en a pas).
+        wall et cpu remplacent les mesures du thread courant, pour une étape exécutée ailleurs (processus de lecture).
+        """
+        if not self.enabled or self._current is None:
+            return
+        stage, stage_details, start_wall, start_cpu, baseline = self._current
+        measured_wall = time.perf_counter() - start_wall
+        measured_cpu = time.thread_time() - start_cpu
+        peak = None
+        if self.trace_memory:
+            peak = max(0, tracemalloc.get_traced_memory()[1] - baseline)
+            _stop_tracing()
+        self._current = None
+        self.record(
+            stage,
+            measured_wall if wall is None else wall,
+            measured_cpu if cpu is None else cpu,
+            peak,
+            **{**stage_details, **details}
+        )
+
+    def record(self, stage, wall, cpu=None, peak_bytes=None, **details):
+        """Ajoute une étape mesurée par ailleurs."""
+        if not self.enabled:
+            return
+        self.entries.append({
+            'stage': stage,
+            'wall_s': wall,
+            'cpu_s': cpu,
+            'peak_bytes': peak_bytes,
+            'details': details,
+        })
+
+    def report(self):
+        """
+        Rapport structuré : une entrée par étape, dans l'ordre d'exécution.
+        Les passages multiples dans une même étape sont cumulés (durées additionnées, pic maximal).
+        """
+        self.end()
+        merged = {}
+        for entry in self.entries:
+            current = merged.get(entry['stage'])
+            if current is None:
+                merged[entry['stage']] = {**entry, 'details': dict(entry['details'])}
+                continue
+            current['wall_s'] += entry['wall_s']
+            if entry['cpu_s'] is not None:
+                current['cpu_s'] = (current['cpu_s'] or 0) + entry['cpu_s']
+            if entry['peak_bytes'] is not None:
+                current['peak_bytes'] = max(current['peak_bytes'] or 0, entry['peak_bytes'])
+            current['details'].update(entry['details'])
+        return list(merged.values())
+
+    def total_wall(self):
+        """Durée réelle cumulée de toutes les étapes (secondes)."""
+        return sum(entry['wall_s'] for entry in self.report())
+
+    def rows(self):
+        """Rapport sous forme de lignes lisibles (étape, durée, CPU, pic mémoire en Mo, détails), pour un tableau."""
+        return [
+            {
+                'Étape': entry['stage'],
+                'Durée (s)': round(entry['wall_s'], 3),
+                'CPU (s)': None if entry['cpu_s'] is None else round(entry['cpu_s'], 3),
+                'Pic mémoire (Mo)': None if entry['peak_bytes'] is None else round(entry['peak_bytes'] / (1024 * 1024), 1),
+                'Détails': ", ".join(f"{key}={value}" for key, value in entry['details'].items()),
+            }
+            for entry in self.report()
+        ]
+
+    def format_report(self):
+        """Rapport texte, une ligne par étape."""
+        lines = [f"--- PROFIL {self.name} ---" if self.name else "--- PROFIL ---"]
+        for row in self.rows():
+            cpu = "-" if row['CPU (s)'] is None else f"{row['CPU (s)']:.3f}"
+            peak = "-" if row['Pic mémoire (Mo)'] is None else f"{row['Pic mémoire (Mo)']:.1f}"
+            line = f"{row['Étape']:<28} {row['Durée (s)']:>8.3f} s  CPU {cpu:>8} s  mémoire {peak:>7} Mo"
+            if row['Détails']:
+                line += f"  ({row['Détails']})"
+            lines.append(line)
+        return "\n".join(lines)
+
+def ensure_profiler(profiler):
+    """Retourne profiler, ou un profiler désactivé si aucun n'est fourni."""
+    return profiler if profiler is not None else StageProfiler(enabled=False)
+
+def profiled(func):
+    """
+    Décorateur pour les fonctions acceptant profiler= :
+    garantit un profiler (désactivé si absent) et clôt l'étape en cours à la sortie, même en cas de retour anticipé.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, profiler=None, **kwargs):
+        profiler = ensure_profiler(profiler)
+        try:
+            return func(*args, profiler=profiler, **kwargs)
+        finally:
+            profiler.end()
+    return wrapper
@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+# Scripts à plat à la racine du dépôt, générateur d'exports synthétiques dans benchmarks/
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+sys.path.insert(0, os.path.join(BASE_DIR, "benchmarks"))
+
+import parse_cache  # noqa: E402 (après l'ajout du dépôt à sys.path)
+
+@pytest.fixture(autouse=True)
+def isolated_parse_cache(tmp_path, monkeypatch):
+    """Cache de lecture dans le dossier temporaire du test, jamais dans le .parse_cache du dépôt."""
+    monkeypatch.setattr(parse_cache, 'CACHE_DIR', str(tmp_path / ".parse_cache"))
@@ -0,0 +1,83 @@
+import os
+from datetime import date
+
+import attendance_store
+from pointage_records import DAYS_FRENCH
+from generate_pointage import generate_rows, write_xlsx
+
+EXPORT_NAME = "POINTAGE SITE A DECEMBRE 2025.xlsx"
+
+def write_export(folder, rows):
+    """Écrit les lignes d'un export dans folder/EXPORT_NAME et retourne son chemin."""
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, EXPORT_NAME)
+    write_xlsx(path, rows)
+    return path
+
+def export_rows(seed, n_days=10):
+    """Export synthétique de 5 employés à partir du 1er décembre 2025."""
+    return generate_rows(n_employees=5, n_days=n_days, start=date(2025, 12, 1), seed=seed, ouvrier_ratio=0)
+
+def rows_between(rows, first_day, last_day, pointages=None):
+    """
+    Mêmes employés, lignes de jour limitées aux jours first_day..last_day du mois ;
+    pointages remplace la colonne des pointages de ces lignes.
+    """
+    selected = []
+    for row in rows:
+        if row[0][:2] not in DAYS_FRENCH:
+            selected.append(row)
+        elif first_day <= int(row[0][3:5]) <= last_day:
+            selected.append(row if pointages is None else (row[0], row[1], pointages))
+    return selected
+
+def test_same_named_exports_from_two_sites_are_both_kept(tmp_path):
+    store = str(tmp_path / "history.sqlite")
+    write_export(tmp_path / "site1", export_rows(seed=1))
+    write_export(tmp_path / "site2", export_rows(seed=2))
+
+    assert attendance_store.import_sources(str(tmp_path / "site1"), store) == ([EXPORT_NAME], [])
+    assert attendance_store.import_sources(str(tmp_path / "site2"), store) == ([EXPORT_NAME], [])
+    # Réimport : contenu inchangé, rien n'est relu ni remplacé
+    assert attendance_store.import_sources(str(tmp_path / "site1"), store) == ([], [EXPORT_NAME])
+
+    files = attendance_store.stored_files(store)
+    assert len(files) == 2
+    records = attendance_store.query_records(store_path=store)
+    assert len(records) == 2 * 5 * 10
+    assert records['name'].nunique() == 10
+
+def test_homonyms_with_different_matricules_are_both_kept(tmp_path):
+    store = str(tmp_path / "history.sqlite")
+    for site, service, matricule in (("site1", "FINANCE", "111"), ("site2", "ATELIER", "222")):
+        rows = [
+            (f"SERVICE / SECTION : {service}", None, None),
+            ("NOM : ALAOUI FATIMA", None, None),
+            (f"MATRICULE : {matricule}", None, None),
+            ("Date", "HJ", "Pointages"),
+        ]
+        rows += [(f"{DAYS_FRENCH[day - 1]} {day:02d}/12/2025", "100", "08:00 17:00") for day in range(1, 6)]
+        write_export(tmp_path / site, rows)
+        attendance_store.import_sources(str(tmp_path / site), store)
+
+    records = attendance_store.query_records(store_path=store)
+    assert len(records) == 2 * 5
+    assert set(records['matricule']) == {"111", "222"}
+
+def test_overlapping_exports_keep_one_row_per_employee_and_date(tmp_path):
+    store = str(tmp_path / "history.sqlite")
+    # Même site (mêmes employés), deux exports dont les périodes se chevauchent sur 5 jours
+    rows = export_rows(seed=1, n_days=15)
+    write_export(tmp_path / "early", rows_between(rows, 1, 10))
+    write_export(tmp_path / "late", rows_between(rows, 6, 15, pointages="08:00 17:00"))
+    attendance_store.import_sources(str(tmp_path / "early"), store)
+    attendance_store.import_sources(str(tmp_path / "late"), store)
+
+    records = attendance_store.query_records(store_path=store)
+    assert len(records) == 5 * 15
+    assert not records.duplicated(['name', 'date']).any()
+
+    # Les jours communs viennent de l'export importé en dernier
+    overlap = records[records['date'].between('2025-12-06', '2025-12-10')]
+    assert len(overlap) == 5 * 5
+    assert (overlap['raw_pointages'] == "08:00 17:00").all()
@@ -0,0 +1,37 @@
+from datetime import date
+
+import business_calendar
+from analysis_per_month import build_monthly_records
+from pointage_records import load_file_records
+from generate_pointage import write_xlsx
+
+def leave_export(path):
+    """Export d'un employé du lundi 1er au samedi 6 décembre 2025 : congé le 3, présent les autres jours."""
+    rows = [
+        ("SERVICE / SECTION : FINANCE", None, None),
+        ("NOM : BENNANI ALI", None, None),
+        ("MATRICULE : 1", None, None),
+        ("Date", "HJ", "Pointages"),
+    ]
+    for day in range(1, 7):
+        label = f"{['Lu', 'Ma', 'Me', 'Je', 'Ve', 'Sa'][day - 1]} {day:02d}/12/2025"
+        rows.append((label, "100", "CONGE-ANNUEL" if day == 3 else "08:00 12:00 13:00 17:00"))
+    rows.append(("Heures totales", None, None))
+    write_xlsx(path, rows)
+    return str(path)
+
+def test_business_days_counts_inclusive_bounds_without_sundays_and_table_holidays():
+    assert business_calendar.business_days(date(2025, 12, 1), date(2025, 12, 7)) == 6
+    assert business_calendar.business_days(date(2025, 12, 1), date(2025, 12, 7), holidays=["2025-12-03"]) == 5
+    assert business_calendar.business_days(date(2025, 12, 7), date(2025, 12, 1)) == 0
+
+def test_leave_on_a_table_holiday_is_not_subtracted_twice(tmp_path, monkeypatch):
+    records = load_file_records(leave_export(tmp_path / "POINTAGE SITE A DECEMBRE 2025.xlsx"), use_cache=False)
+    assert build_monthly_records(records)['is_leave'].sum() == 1
+
+    monkeypatch.setattr(business_calendar, 'PUBLIC_HOLIDAYS', ["2025-12-03"])
+    df = build_monthly_records(records)
+    assert df['is_leave'].sum() == 0
+    # 5 jours ouvrés attendus (6 moins le férié), tous travaillés : aucune absence
+    expected = business_calendar.business_days(df['full_date'].min(), df['full_date'].max())
+    assert expected - df['is_leave'].sum() - df['is_holiday'].sum() == df['is_day_worked'].sum() == 5
@@ -0,0 +1,35 @@
+from datetime import date
+
+import pytest
+from openpyxl import load_workbook
+
+import pointage_records
+from analysis_per_month import process_monthly_analysis
+from generate_pointage import generate_rows, write_xlsx
+
+@pytest.fixture
+def input_dir(tmp_path, monkeypatch):
+    """Deux exports (le second avec un dernier jour incomplet) et un fichier illisible ; petits lots."""
+    monkeypatch.setattr(pointage_records, 'USE_PARSE_CACHE', False)
+    monkeypatch.setattr(pointage_records, 'RECORD_BATCH_ROWS', 40)
+    folder = tmp_path / "exports"
+    folder.mkdir()
+    write_xlsx(str(folder / "POINTAGE SITE A DECEMBRE 2025.xlsx"), generate_rows(12, 20, date(2025, 12, 1), seed=1))
+    write_xlsx(
+        str(folder / "POINTAGE SITE B DECEMBRE 2025.xlsx"),
+        generate_rows(9, 11, date(2025, 12, 21), seed=2, incomplete_last_day=True)
+    )
+    (folder / "POINTAGE SITE C DECEMBRE 2025.xlsx").write_bytes(b"pas un classeur")
+    return str(folder)
+
+def report_cells(path):
+    return [[cell.value for cell in row] for row in load_workbook(path).active.iter_rows()]
+
+@pytest.mark.parametrize('period', [None, (date(2025, 12, 5), date(2025, 12, 31))])
+def test_streamed_totals_match_the_shared_table(input_dir, tmp_path, period):
+    streamed = process_monthly_analysis(input_dir, str(tmp_path / "lots"), period=period, stream=True)
+    table = process_monthly_analysis(input_dir, str(tmp_path / "table"), period=period, stream=False)
+
+    assert streamed is not None and table is not None
+    assert streamed.rsplit("/", 1)[-1] == table.rsplit("/", 1)[-1]
+    assert report_cells(streamed) == report_cells(table)
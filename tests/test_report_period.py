@@ -0,0 +1,29 @@
+from datetime import date
+
+from analysis_per_month import build_monthly_records
+from late_arrivals_graph import select_graph_records
+from pointage_records import DAYS_FRENCH, load_file_records
+from generate_pointage import write_xlsx
+
+PERIOD = (date(2025, 12, 11), date(2025, 12, 13))
+
+def employee_rows(name, matricule, hj_code):
+    """Bloc d'un employé du 1er au 13 décembre 2025 ; hj_code(jour) donne le code HJ de chaque jour."""
+    rows = [(f"NOM : {name}", None, None), (f"MATRICULE : {matricule}", None, None), ("Date", "HJ", "Pointages")]
+    for day in range(1, 14):
+        label = f"{DAYS_FRENCH[date(2025, 12, day).weekday()]} {day:02d}/12/2025"
+        rows.append((label, hj_code(day), "08:00 12:00 13:00 17:00"))
+    return rows
+
+def test_ouvrier_filter_runs_on_the_whole_table_before_the_period(tmp_path):
+    path = str(tmp_path / "POINTAGE SITE A DECEMBRE 2025.xlsx")
+    rows = [("SERVICE / SECTION : ATELIER", None, None)]
+    rows += employee_rows("BENNANI ALI", 1, lambda day: "100")
+    # OUVRIER sur la majorité du mois (codes 130 jusqu'au 10), pas sur la période demandée
+    rows += employee_rows("TAZI OMAR", 2, lambda day: "130" if day <= 10 else "100")
+    write_xlsx(path, rows)
+    records = load_file_records(path, use_cache=False)
+
+    assert set(build_monthly_records(records)['name']) == {"BENNANI ALI"}
+    assert set(build_monthly_records(records, period=PERIOD)['name']) == {"BENNANI ALI"}
+    assert set(select_graph_records(records, PERIOD)['name']) == {"BENNANI ALI"}